@@ -1,5 +1,6 @@
 import os
 import configparser
+import storage
 
 
 config = configparser.ConfigParser()
@@ -34,6 +35,10 @@ if not os.path.exists(config["settings"]["current_season"] + "/data"):
     os.makedirs(config["settings"]["current_season"] + "/data")
 if not os.path.exists(config["settings"]["current_season"] + "/data/managers"):
     os.makedirs(config["settings"]["current_season"] + "/data/managers")
+if not os.path.exists(config["settings"]["current_season"] + "/data/managers/info"):
+    os.makedirs(config["settings"]["current_season"] + "/data/managers/info")
+if not os.path.exists(config["settings"]["current_season"] + "/data/managers/unavailable"):
+    os.makedirs(config["settings"]["current_season"] + "/data/managers/unavailable")
 if not os.path.exists(config["settings"]["current_season"] + "/data/players"):
     os.makedirs(config["settings"]["current_season"] + "/data/players")
 if not os.path.exists(config["settings"]["current_season"] + "/data/players/gameweek_history"):
@@ -50,5 +55,4 @@ if not os.path.exists(config["settings"]["current_season"] + "/data/fixtures"):
     os.makedirs(config["settings"]["current_season"] + "/data/fixtures")
 for i in range(1, 39):
     if not os.path.exists(config["settings"]["current_season"] + "/data/players/gameweek_history/gameweek_" + str(i) + ".json"):
-        with open(config["settings"]["current_season"] + "/data/players/gameweek_history/gameweek_" + str(i) + ".json", "w") as file:
-            file.write("[]")
+        storage.write_text(config["settings"]["current_season"] + "/data/players/gameweek_history/gameweek_" + str(i) + ".json", "[]")
@@ -0,0 +1,132 @@
+import configparser
+from typing import Dict, Union
+
+import indexes
+
+config = configparser.ConfigParser()
+config.read("conf/config.ini")
+
+
+class CaptaincyRecord:
+    def __init__(self, manager: str, manager_id: int, gameweek: int, captain: Union[None, int], vice_captain: Union[None, int],
+                 element: Union[None, int], multiplier: int, points: int):
+        """ Captaincy of one manager in one gameweek.
+
+        :param manager: (str) | Nickname of the manager.
+        :param manager_id: (int) | ID of the manager.
+        :param gameweek: (int) | Gameweek.
+        :param captain: (int) or None | Element picked as captain.
+        :param vice_captain: (int) or None | Element picked as vice-captain.
+        :param element: (int) or None | Element that got the captain multiplier. None if neither captain nor vice-captain played.
+        :param multiplier: (int) | Multiplier of element: 2, or 3 with the triple captain chip. 1 if element is None.
+        :param points: (int) | Points of element in gameweek, double gameweeks summed.
+        """
+        self.manager = manager
+        self.manager_id = manager_id
+        self.gameweek = gameweek
+        self.captain = captain
+        self.vice_captain = vice_captain
+        self.element = element
+        self.multiplier = multiplier
+        self.points = points
+
+    def __repr__(self):
+        return f"CaptaincyRecord({self.manager}, GW{self.gameweek}, element={self.element}, extra_points={self.extra_points})"
+
+    @property
+    def captain_played(self) -> bool:
+        return self.element is not None and self.element == self.captain
+
+    @property
+    def vice_captain_played(self) -> bool:
+        return self.element is not None and self.element == self.vice_captain
+
+    @property
+    def is_triple_captain(self) -> bool:
+        return self.multiplier == 3
+
+    @property
+    def extra_points(self) -> int:
+        """ Points gained by the armband on top of the points the element scores anyway. """
+        return self.points * (self.multiplier - 1)
+
+
+class CaptaincyTable:
+    def __init__(self, records: Dict[tuple, CaptaincyRecord]):
+        """ Captaincy records of many managers, keyed by (manager nickname, gameweek). Built by build_captaincy_table. """
+        self._records = records
+
+    @property
+    def records(self) -> Dict[tuple, CaptaincyRecord]:
+        return self._records
+
+    def managers(self) -> list:
+        return list(dict.fromkeys(manager for manager, _ in self._records))
+
+    def gameweeks(self, manager: str) -> list:
+        return sorted(gameweek for record_manager, gameweek in self._records if record_manager == manager)
+
+    def get(self, manager: str, gameweek: int) -> Union[None, CaptaincyRecord]:
+        return self._records.get((manager, int(gameweek)))
+
+    def extra_points(self, manager: str, lower_gameweek: Union[None, int] = None, upper_gameweek: Union[None, int] = None) -> list:
+        """ Return the extra captaincy points of manager per gameweek, from lower_gameweek to upper_gameweek.
+
+        Without bounds, every stored gameweek of the manager is returned.
+
+        :raise ValueError: If a gameweek between the bounds is not stored for manager.
+        """
+        if lower_gameweek is None or upper_gameweek is None:
+            gameweeks = self.gameweeks(manager)
+        else:
+            gameweeks = range(int(lower_gameweek), int(upper_gameweek) + 1)
+        result = list()
+        for gameweek in gameweeks:
+            record = self.get(manager, gameweek)
+            if record is None:
+                raise ValueError(f"Gameweek {gameweek} not found for manager {manager}")
+            result.append(record.extra_points)
+        return result
+
+    def extra_points_per_manager(self, lower_gameweek: Union[None, int] = None, upper_gameweek: Union[None, int] = None) -> dict:
+        return {manager: self.extra_points(manager, lower_gameweek, upper_gameweek) for manager in self.managers()}
+
+
+def build_captaincy_table(managers: Union[None, dict] = None, lower_gameweek: int = 1, upper_gameweek: int = 38) -> CaptaincyTable:
+    """ Compute the captaincy of every manager in every stored gameweek in one pass.
+
+    Picks are read once per manager through indexes.get_picks_index and points once through indexes.points_store.
+    The element that got the captain multiplier is the captain, or the vice-captain if the captain did not play.
+    Managers without stored picks are left out.
+
+    :param managers: (dict) or None | Manager nickname mapped to manager ID. Defaults to config["managers"].
+    :param lower_gameweek: (int) | First gameweek included.
+    :param upper_gameweek: (int) | Last gameweek included.
+    :return: (CaptaincyTable)
+    """
+    if managers is None:
+        managers = dict(config["managers"].items())
+    points = indexes.points_store.index()
+    records = dict()
+    for manager, manager_id in managers.items():
+        picks_index = indexes.get_picks_index(f"{config['settings']['current_season']}/data/managers/{manager}_{manager_id}.json")
+        if picks_index.signature() is None:
+            continue
+        for gameweek, event in sorted(picks_index.index().items()):
+            if not lower_gameweek <= gameweek <= upper_gameweek:
+                continue
+            captain = None
+            vice_captain = None
+            element = None
+            multiplier = 1
+            for pick in event["picks"]:
+                if pick["is_captain"]:
+                    captain = pick["element"]
+                if pick["is_vice_captain"]:
+                    vice_captain = pick["element"]
+                if (pick["is_captain"] or pick["is_vice_captain"]) and int(pick["multiplier"]) > 1:
+                    element = pick["element"]
+                    multiplier = int(pick["multiplier"])
+            element_points = points.get((element, gameweek), 0) if element is not None else 0
+            records[(manager, gameweek)] = CaptaincyRecord(manager, int(manager_id), gameweek, captain, vice_captain, element, multiplier, element_points)
+    return CaptaincyTable(records)
@@ -1,8 +1,12 @@
 import configparser
+import copy
 import json
 import os
 from typing import Union
 import fpl_api
+import indexes
+import sqlite_store
+import standings
 
 config = configparser.ConfigParser()
 config.read("conf/config.ini")
@@ -18,18 +22,13 @@ class Team:
             self._short_name = None
             self.set_names()
         else:
-            self._short_name = None
-            if not os.path.exists(config["settings"]["current_season"] + "/data/teams/all_teams.json"):
-                raise FileNotFoundError(f"File {config['settings']['current_season'] + '/data/teams/all_teams.json'} not found")
-            with open(config["settings"]["current_season"] + "/data/teams/all_teams.json", "r") as file:
-                teams_json = json.load(file)
-            for team in teams_json:
-                if team_short_name.upper() == team["short_name"]:
-                    self._short_name = team["short_name"]
-                    self._id = team["id"]
-                    self._name = team["name"]
-            if not self._short_name:
+            database = sqlite_store.get_database()
+            team = database.get_team_by_name(team_short_name) if database is not None else indexes.team_registry.get_by_name(team_short_name)
+            if not team or team["short_name"] != team_short_name.upper():
                 raise ValueError(f"Team short name {team_short_name} not found in teams")
+            self._short_name = team["short_name"]
+            self._id = team["id"]
+            self._name = team["name"]
 
     def __str__(self):
         return f'Team {self.name} with ID {self.id}'
@@ -59,26 +58,38 @@ class Team:
         self._short_name = new_short_name
 
     def set_names(self):
-        team_json = None
-        for file in os.listdir(config["settings"]["current_season"] + "/data/teams/"):
-            if file.split("_")[0] == str(self.id):
-                with open(config["settings"]["current_season"] + "/data/teams/" + file) as loaded_file:
-                    team_json = json.load(loaded_file)
-                    self.name = team_json["name"]
-                    self.short_name = team_json["short_name"]
-        if not team_json:
+        database = sqlite_store.get_database()
+        team = database.get_team(self.id) if database is not None else indexes.team_registry.get(self.id)
+        if team:
+            self.name = team["name"]
+            self.short_name = team["short_name"]
+        else:
             self.short_name = None
             self.name = None
 
 
+# Manager info fetched from the API, shared by all FantasyPremierLeagueManager objects of the process.
+manager_info_cache = dict()
+
+
 class FantasyPremierLeagueManager:
-    def __init__(self, person_id: Union[int, str]):
+    def __init__(self, person_id: Union[int, str], offline: bool = False):
+        """ Fantasy Premier League manager.
+
+        Names and info are loaded lazily on first access. The API is called at most once per manager ID per process,
+        because the fetched info is shared through manager_info_cache.
+
+        :param person_id: (int) or (str) | ID of the manager.
+        :param offline: (bool) | If set to True, info is read from the stored data/managers/info/<id>.json and the API is never called.
+        """
         self._id = int(person_id)
+        self._offline = offline
         self._first_name = None
         self._last_name = None
         self._nickname = None
-        self.set_names()
-        self._info = self.get_info()
+        self._info = None
+        self._info_loaded = False
+        self.set_nickname()
 
     def __str__(self):
         return f'FPL Manager {self.first_name} {self.last_name} (with nickname {self.nickname}) with ID {self.id}'
@@ -87,12 +98,18 @@ class FantasyPremierLeagueManager:
     def id(self):
         return self._id
 
+    @property
+    def offline(self):
+        return self._offline
+
     @property
     def first_name(self):
+        self.load_info()
         return self._first_name
 
     @property
     def last_name(self):
+        self.load_info()
         return self._last_name
 
     @property
@@ -101,19 +118,23 @@ class FantasyPremierLeagueManager:
 
     @property
     def info(self):
+        self.load_info()
         return self._info
 
     @id.setter
     def id(self, new_id: Union[int, str]):
-        self._id = new_id
-        self.set_names()
+        self._id = int(new_id)
+        self._info_loaded = False
+        self.set_nickname()
 
     @first_name.setter
     def first_name(self, new_first_name: str):
+        self.load_info()
         self._first_name = new_first_name
 
     @last_name.setter
     def last_name(self, new_last_name: str):
+        self.load_info()
         self._last_name = new_last_name
 
     @nickname.setter
@@ -122,22 +143,42 @@ class FantasyPremierLeagueManager:
 
     @info.setter
     def info(self, new_info):
+        self._info_loaded = True
         self._info = new_info
 
     def get_info(self):
-        person_info_call = fpl_api.FPLCalls().get_person_info(self.id)
-        if person_info_call.status_code != 200:
+        if self.offline:
+            path = f"{config['settings']['current_season']}/data/managers/info/{self.id}.json"
+            if not os.path.exists(path):
+                return
+            with open(path, "r") as file:
+                return json.load(file)
+        if self.id not in manager_info_cache:
+            person_info_call = fpl_api.FPLCalls().get_person_info(self.id)
+            if person_info_call.status_code != 200:
+                return
+            manager_info_cache[self.id] = json.loads(person_info_call.text)
+        return manager_info_cache[self.id]
+
+    def load_info(self):
+        """ Load info and names on first use. """
+        if self._info_loaded:
             return
-        return json.loads(person_info_call.text)
+        self._info_loaded = True
+        self.set_names()
 
     def set_names(self):
-        info = self.get_info()
-        if info:
-            self._first_name = info["player_first_name"]
-            self._last_name = info["player_last_name"]
+        self._info_loaded = True
+        self._info = self.get_info()
+        if self._info:
+            self._first_name = self._info["player_first_name"]
+            self._last_name = self._info["player_last_name"]
         else:
-            self.first_name = None
-            self.last_name = None
+            self._first_name = None
+            self._last_name = None
+        self.set_nickname()
+
+    def set_nickname(self):
         nickname_set = False
         for key, value in config["managers"].items():
             if value == str(self.id):
@@ -152,19 +193,19 @@ class FantasyPremierLeagueManager:
             return
         return json.loads(history_call.text)
 
+    def get_picks_index(self) -> indexes.PicksIndex:
+        """ Return the gameweek-keyed index of the stored picks of this manager. It is reparsed only when the file changes. """
+        return indexes.get_picks_index(f"{config['settings']['current_season']}/data/managers/{self.nickname}_{self.id}.json")
+
     def get_picks_for_gw(self, gameweek: Union[int, str]):
         supported_types = [int, str]
         if type(gameweek) not in supported_types:
             raise TypeError(f"Given variable 'gameweek' is type {type(gameweek)}. Please give type {supported_types}")
-        if os.path.exists(f"{config['settings']['current_season']}/data/managers/{self.nickname}_{self.id}.json"):
-            with open(f"{config['settings']['current_season']}/data/managers/{self.nickname}_{self.id}.json", "r") as file:
-                manager_season_history_json = json.load(file)
-        else:
-            raise FileNotFoundError(f"File {config['settings']['current_season']}/data/managers/{self.nickname}_{self.id}.json not found")
-        for event in manager_season_history_json:
-            if event["entry_history"]["event"] == int(gameweek):
-                return event
-        raise ValueError(f"Gameweek {gameweek} not found in file")
+        database = sqlite_store.get_database()
+        event = database.get_manager_gameweek(self.id, gameweek) if database is not None else self.get_picks_index().get(gameweek)
+        if event is None:
+            raise ValueError(f"Gameweek {gameweek} not found in file")
+        return event
 
 
 class PremierLeaguePlayer:
@@ -211,19 +252,13 @@ class PremierLeaguePlayer:
         self._web_name = new_web_name
 
     def set_names(self):
-        if not os.path.exists(f"{config['settings']['current_season']}/data/bootstrap_static.json"):
-            raise FileNotFoundError(f"File {config['settings']['current_season']}/data/bootstrap_static.json not found")
-        with open(f"{config['settings']['current_season']}/data/bootstrap_static.json", "r") as file:
-            bootstrap_static = json.load(file)
-
-        player_found = False
-        for player in bootstrap_static["elements"]:
-            if player["id"] == self.id:
-                player_found = True
-                self.first_name = player["first_name"]
-                self.second_name = player["second_name"]
-                self.web_name = player["web_name"]
-        if not player_found:
+        database = sqlite_store.get_database()
+        player = database.get_element(self.id) if database is not None else indexes.player_index.get(self.id)
+        if player:
+            self.first_name = player["first_name"]
+            self.second_name = player["second_name"]
+            self.web_name = player["web_name"]
+        else:
             self.first_name = None
             self.second_name = None
             self.web_name = None
@@ -235,6 +270,8 @@ class PremierLeaguePlayer:
         if not os.path.exists(f"{config['settings']['current_season']}/data/players/{self.id}_{self.web_name}.json"):
             raise FileNotFoundError(f"File {config['settings']['current_season']}/data/players/{self.id}_{self.web_name}.json not found")
 
+        if indexes.history_columns.is_newer_than(f"{config['settings']['current_season']}/data/players/{self.id}_{self.web_name}.json"):
+            return indexes.history_columns.index().element_rows(self.id)
         with open(f"{config['settings']['current_season']}/data/players/{self.id}_{self.web_name}.json", "r") as file:
             return json.load(file)
 
@@ -269,6 +306,23 @@ class Gameweek:
             return
         return json.loads(live_call.text)
 
+    def apply_live_deltas(self, gameweek: int, deltas: dict):
+        """ Update players_stats with the changed elements of a live.LivePoller poll, without fetching the gameweek again.
+
+        Subscribe it to a poller of the same gameweek: poller.subscribe(gameweek.apply_live_deltas).
+
+        :param gameweek: (int) | Gameweek of the poll. Polls of other gameweeks are ignored.
+        :param deltas: (dict) | live.ElementDelta of every changed element, keyed by element ID.
+        """
+        if int(gameweek) != int(self.id) or self.players_stats is None:
+            return
+        elements = {element["id"]: element for element in self.players_stats["elements"]}
+        for element_id, delta in deltas.items():
+            if element_id in elements:
+                elements[element_id]["stats"] = delta.stats
+            else:
+                self.players_stats["elements"].append({"id": element_id, "stats": delta.stats, "explain": list()})
+
 
 class League:
     def __init__(self, league_id: int, league_type="CLASSIC"):
@@ -278,8 +332,8 @@ class League:
             raise ValueError("Invalid league type. Expected one of: %s" % league_types)
         self._league_type = league_type
         self._name = None
-        self.set_name()
         self._properties = self.get_standings()
+        self.set_name()
 
     def __str__(self):
         return f'League {self.name} with ID {self.id}'
@@ -320,10 +374,11 @@ class League:
         self._properties = new_properties
 
     def set_name(self):
-        standings = self.get_standings()
-        self.name = standings["league"]["name"]
+        league_standings = self.properties if self.properties is not None else self.get_standings()
+        self.name = league_standings["league"]["name"]
 
     def get_standings(self):
+        """ Get page 1 of the standings. Use crawl_standings for all pages. """
         if self.league_type == "CLASSIC":
             standings_call = fpl_api.FPLCalls().get_classic_league_standings(self.id, page_new_entries=None, page_standings=None, phase=None)
         elif self.league_type == "H2H":
@@ -334,6 +389,10 @@ class League:
             return
         return json.loads(standings_call.text)
 
+    def crawl_standings(self, phase: Union[None, int] = None, max_workers: int = 8) -> standings.StandingsStore:
+        """ Crawl all pages of the standings into the store of this league. See standings.StandingsCrawler. """
+        return standings.StandingsCrawler(self.id, self.league_type, phase, max_workers=max_workers).crawl()
+
 
 class Fixture:
     def __init__(self, fixture_id: Union[None, int]):
@@ -460,13 +519,11 @@ class Fixture:
         return
 
     def set_fixture_properties(self):
-        fixture = None
-        for file in os.listdir(config["settings"]["current_season"] + "/data/fixtures/"):
-            if self.id == int(file.split("-")[0]):
-                # print(self.id, )
-                with open(config["settings"]["current_season"] + "/data/fixtures/" + file, "r") as json_file:
-                    fixture = json.load(json_file)
+        database = sqlite_store.get_database()
+        fixture = database.get_fixture(self.id) if database is not None else indexes.fixture_repository.get(self.id)
         if fixture:
+            # The stats are rewritten with player objects below, so never touch the shared fixture of the repository.
+            fixture = copy.deepcopy(fixture)
             self._home_team = Team(fixture["team_h"])
             self._away_team = Team(fixture["team_a"])
             self._home_team_score = fixture["team_h_score"]
@@ -0,0 +1,175 @@
+import io
+import json
+import os
+import shutil
+from typing import Union
+
+import numpy as np
+
+import storage
+
+
+def _column_kind(values: list) -> str:
+    present = [value for value in values if value is not None]
+    if not present:
+        return "nullable_int"
+    if all(isinstance(value, bool) for value in present):
+        return "bool" if len(present) == len(values) else "string"
+    if all(isinstance(value, int) and not isinstance(value, bool) for value in present):
+        return "int" if len(present) == len(values) else "nullable_int"
+    if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in present):
+        return "float"
+    if all(isinstance(value, str) for value in present) and len(present) == len(values):
+        try:
+            for value in present:
+                float(value)
+        except ValueError:
+            return "string"
+        return "decimal_string"
+    return "string"
+
+
+def _decimals(values: list) -> int:
+    return max([len(value.split(".")[1]) if "." in value else 0 for value in values], default=0)
+
+
+def _to_array(values: list, kind: str) -> np.ndarray:
+    if kind == "int":
+        array = np.array(values, dtype=np.int64)
+        for dtype in (np.int8, np.int16, np.int32):
+            if array.size == 0 or (array.min() >= np.iinfo(dtype).min and array.max() <= np.iinfo(dtype).max):
+                return array.astype(dtype)
+        return array
+    if kind == "bool":
+        return np.array(values, dtype=np.bool_)
+    if kind in ("nullable_int", "float"):
+        return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+    if kind == "decimal_string":
+        return np.array([float(value) for value in values], dtype=np.float32)
+    return np.array(["" if value is None else str(value) for value in values], dtype=np.str_)
+
+
+def _save_array(path: str, array: np.ndarray):
+    content = io.BytesIO()
+    np.save(content, array)
+    storage.write_bytes(path, content.getvalue())
+
+
+def write_history_columns(rows, directory: str):
+    """ Store player history rows as one typed .npy array per field, with an index by element.
+
+    Rows are deduplicated by (element, fixture) and sorted by element, round and fixture, so the rows of one element are
+    one contiguous slice. All files are written to a temporary directory first, which then replaces directory.
+
+    :param rows: (iterable) | History rows as returned by the element-summary endpoint.
+    :param directory: (str) | Directory of the columnar store.
+    """
+    unique_rows = {(row["element"], row["fixture"]): row for row in rows}
+    rows = sorted(unique_rows.values(), key=lambda row: (row["element"], row["round"], row["fixture"]))
+    columns = list()
+    for row in rows:
+        for key in row:
+            if key not in columns:
+                columns.append(key)
+
+    temp_directory = directory.rstrip("/") + ".tmp"
+    if os.path.exists(temp_directory):
+        shutil.rmtree(temp_directory)
+    os.makedirs(temp_directory)
+    meta = {"rows": len(rows), "columns": list()}
+    for column in columns:
+        values = [row.get(column) for row in rows]
+        kind = _column_kind(values)
+        column_meta = {"name": column, "kind": kind}
+        if kind == "decimal_string":
+            column_meta["decimals"] = _decimals(values)
+        _save_array(os.path.join(temp_directory, column + ".npy"), _to_array(values, kind))
+        meta["columns"].append(column_meta)
+
+    elements = np.array([row["element"] for row in rows], dtype=np.int64)
+    unique_elements, starts = np.unique(elements, return_index=True)
+    _save_array(os.path.join(temp_directory, "_elements.npy"), unique_elements)
+    _save_array(os.path.join(temp_directory, "_starts.npy"), np.append(starts, len(rows)))
+    storage.write_json(os.path.join(temp_directory, "index.json"), meta)
+
+    old_directory = directory.rstrip("/") + ".old"
+    if os.path.exists(old_directory):
+        shutil.rmtree(old_directory)
+    if os.path.exists(directory):
+        os.replace(directory, old_directory)
+    os.replace(temp_directory, directory)
+    storage.fsync_directory(os.path.dirname(directory.rstrip("/")) or ".")
+    if os.path.exists(old_directory):
+        shutil.rmtree(old_directory)
+
+
+class ColumnarHistory:
+    def __init__(self, directory: str):
+        """ Reader of a columnar store written by write_history_columns.
+
+        All columns are memory-mapped when the store is opened, so a reader keeps a consistent version when the store is
+        rewritten, but only the columns and rows that are accessed are read from disk.
+
+        :param directory: (str) | Directory of the columnar store.
+        :raise FileNotFoundError: If no columnar store is found in directory.
+        """
+        self._directory = directory
+        index_path = os.path.join(directory, "index.json")
+        if not os.path.exists(index_path):
+            raise FileNotFoundError(f"File {index_path} not found")
+        with open(index_path, "r") as file:
+            meta = json.load(file)
+        self._rows = meta["rows"]
+        self._columns = {column["name"]: column for column in meta["columns"]}
+        self._arrays = {name: np.load(os.path.join(directory, name + ".npy"), mmap_mode="r") for name in self._columns}
+        self._elements = np.load(os.path.join(directory, "_elements.npy"))
+        self._starts = np.load(os.path.join(directory, "_starts.npy"))
+
+    def __len__(self):
+        return self._rows
+
+    @property
+    def directory(self):
+        return self._directory
+
+    @property
+    def columns(self) -> list:
+        return list(self._columns)
+
+    @property
+    def elements(self) -> np.ndarray:
+        return self._elements
+
+    def column(self, name: str) -> np.ndarray:
+        """ Return one column as a memory-mapped array. Decimal strings such as "ict_index" are returned as floats. """
+        if name not in self._columns:
+            raise KeyError(f"Column {name} not found in {self.directory}")
+        return self._arrays[name]
+
+    def element_slice(self, element: Union[int, str]) -> slice:
+        """ Return the slice of the rows of element. The slice is empty if element has no stored rows. """
+        position = int(np.searchsorted(self._elements, int(element)))
+        if position == len(self._elements) or self._elements[position] != int(element):
+            return slice(0, 0)
+        return slice(int(self._starts[position]), int(self._starts[position + 1]))
+
+    def rows(self, selection: Union[slice, np.ndarray]) -> list:
+        """ Rebuild the history rows of a selection as dicts, in the format of the element-summary endpoint. """
+        values = dict()
+        for name, column in self._columns.items():
+            array = self.column(name)[selection]
+            kind = column["kind"]
+            if kind == "decimal_string":
+                values[name] = [f"{value:.{column['decimals']}f}" for value in array.tolist()]
+            elif kind == "nullable_int":
+                values[name] = [None if value != value else int(value) for value in array.tolist()]
+            elif kind == "float":
+                values[name] = [None if value != value else value for value in array.tolist()]
+            else:
+                values[name] = array.tolist()
+        count = len(next(iter(values.values()))) if values else 0
+        return [{name: values[name][row] for name in self._columns} for row in range(count)]
+
+    def element_rows(self, element: Union[int, str]) -> list:
+        return self.rows(self.element_slice(element))
+
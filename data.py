@@ -1,36 +1,112 @@
 import configparser
+import io
 import json
 import os
 
+import requests
+
 import fpl_api
+import json_stream
+import league_managers
+import sqlite_store
+import standings
+import storage
+import sync
 import __init__
-from typing import Union
+from typing import Iterable, Union
 # import info
 
 config = configparser.ConfigParser()
 config.read('conf/config.ini')
 
 
-def fetch_all_latest_info():
-    print("Getting FPL managers...")
-    get_all_person_data_and_save_to_json()
-    print("Getting GW results per player...")
-    get_entire_gameweek_results_per_player_and_save()
-    print("Getting all player properties...")
-    get_entire_player_properties_and_save()
-    print("Getting teams info...")
-    get_all_team_info_and_save()
-    print("Get gameweeks...")
-    get_finished_gameweeks_and_save()
-    print("Get fixtures...")
-    get_all_fixtures_and_save()
-    print("Getting bootstrap_static...")
-    get_bootstrap_static_and_save()
+def fetch_all_latest_info(max_workers: int = 8, incremental: bool = True, use_cache: bool = True, calls_per_second: float = 25.0):
+    """ Sync all season data with the Fantasy Premier League API.
+
+    bootstrap-static and event-status are fetched once into a sync.SeasonSnapshot that every stage uses. All other
+    calls are planned up front and run concurrently on a sync.SyncEngine with at most max_workers calls in flight.
+    Results are saved as they arrive and a summary per stage is printed at the end. Every file is replaced atomically,
+    so an interrupted sync never leaves a truncated file, and all files are flushed to disk together at the end.
+
+    :param max_workers: (int) | Maximum number of API calls in flight at the same time.
+    :param incremental: (bool) | If set to True, only manager picks of gameweeks that are not stored yet are fetched.
+    :param use_cache: (bool) | If set to True, API responses are cached in an fpl_api.ResponseCache and revalidated with conditional calls.
+    :param calls_per_second: (float) | Rate limit shared by all workers. Throttled and failed calls are retried with backoff.
+    """
+    cache = fpl_api.ResponseCache(cache_directory()) if use_cache else None
+    rate_limiter = fpl_api.RateLimiter(rate=calls_per_second, burst=max_workers)
+    with fpl_api.FPLCalls(pool_maxsize=max_workers, pool_block=True, cache=cache, rate_limiter=rate_limiter) as conn:
+        engine = sync.SyncEngine(max_workers=max_workers)
+        print("Getting bootstrap_static...")
+        snapshot = sync.SeasonSnapshot.fetch(conn, engine)
+        if not snapshot:
+            return
+        conn.last_finished_gameweek = snapshot.last_finished_gameweek
+        print("Planning sync...")
+        gameweek_history = sync.GameweekHistoryAccumulator(gameweek_history_directory(), history_columns_directory())
+        with storage.fsync_batch():
+            plan_sync(conn, engine, snapshot, gameweek_history, incremental)
+            print(f"Running {len(engine.planned)} calls...")
+            engine.run()
+            gameweek_history.flush()
+        engine.print_summary()
+        print(conn.report)
+
+
+def plan_sync(conn: fpl_api.FPLCalls, engine: sync.SyncEngine, snapshot: sync.SeasonSnapshot, gameweek_history: sync.GameweekHistoryAccumulator,
+              incremental: bool = True):
+    """ Plan the calls of every sync stage on engine. Stages that only need the snapshot are saved right away.
+
+    :param conn: (fpl_api.FPLCalls) | Connection the planned calls are made with.
+    :param engine: (sync.SyncEngine) | Engine on which the calls are planned.
+    :param snapshot: (sync.SeasonSnapshot) | Snapshot of the current sync run.
+    :param gameweek_history: (sync.GameweekHistoryAccumulator) | Collects the gameweek history rows. Has to be flushed after engine.run().
+    :param incremental: (bool) | If set to True, only manager picks of gameweeks that are not stored yet are planned.
+    """
+    for person_name, person_id in config["managers"].items():
+        gw_history = load_person_picks(person_name, person_id) if incremental else dict()
+        unavailable_gameweeks = load_unavailable_gameweeks(person_id) if incremental else set()
+        missing_gameweeks = get_missing_gameweeks(gw_history, snapshot.previous_gameweek, unavailable_gameweeks, snapshot.last_finished_gameweek)
+
+        def save_picks(response, gameweek, person_name=person_name, person_id=person_id, gw_history=gw_history):
+            # Saved after every response, so the gameweeks fetched so far are kept if another one fails.
+            gw_history[gameweek] = json.loads(response.text)
+            save_person_picks(person_name, person_id, [gw_history[item] for item in sorted(gw_history)])
+
+        def save_unavailable(response, gameweek, person_id=person_id, unavailable_gameweeks=unavailable_gameweeks):
+            if response.status_code == 404:
+                unavailable_gameweeks.add(gameweek)
+                save_unavailable_gameweeks(person_id, unavailable_gameweeks)
+
+        for item in missing_gameweeks:
+            engine.add("managers", conn.get_person_picks, (person_id, item), lambda response, item=item, save_picks=save_picks: save_picks(response, item),
+                       lambda response, item=item, save_unavailable=save_unavailable: save_unavailable(response, item))
+
+    for person_id in config["managers"].values():
+        engine.add("manager_info", conn.get_person_info, (person_id,), lambda response, person_id=person_id: save_person_info(person_id, json.loads(response.text)))
+
+    for player in snapshot.elements:
+        engine.add("player_summaries", conn.get_player_summary, (player["id"],), lambda response, player=player: save_player_summary(player, json.loads(response.text), gameweek_history))
+
+    save_teams(snapshot.bootstrap_static)
+    save_finished_gameweeks(snapshot.bootstrap_static)
+    for gameweek in snapshot.finished_gameweeks:
+        # The live stats of a finished and checked gameweek do not change anymore.
+        if os.path.exists(player_performances_path(gameweek["id"])):
+            continue
+        engine.add("player_performances", conn.get_live_player_stats, (gameweek["id"], True), lambda response, gameweek=gameweek: save_player_performances_response(gameweek["id"], response))
+    engine.add("fixtures", conn.get_fixtures, (None, False, True), save_fixtures_response)
+    save_bootstrap_static(snapshot.bootstrap_static)
+
+
+def cache_directory() -> str:
+    return config["settings"]["current_season"] + "/cache/http"
 
 
 def save_config():
-    with open('conf/config.ini', 'w') as configfile:
-        config.write(configfile)
+    config_text = io.StringIO()
+    config.write(config_text)
+    storage.write_text('conf/config.ini', config_text.getvalue())
 
 
 def add_manager(manager_name: str, manager_id: Union[int, str]):
@@ -71,178 +147,367 @@ def delete_league(league_id: Union[int, str]):
     save_config()
 
 
-def get_all_person_data_and_save_to_json():
-    conn = fpl_api.FPLCalls()
-    event_status_call = conn.get_event_status()
-    if event_status_call.status_code != 200:
-        return
-    event_status = json.loads(event_status_call.text)
-    if event_status["leagues"] == "Updated":
-        previous_gameweek = event_status["status"][0]["event"]
-    else:
-        previous_gameweek = event_status["status"][0]["event"] - 1
+def get_all_league_standings_and_save(max_workers: int = 8, league_type: str = "CLASSIC", calls_per_second: float = 25.0):
+    """ Crawl the standings of every league in config.ini into its standings.StandingsStore.
+
+    Leagues of which the standings did not change since the last crawl cost one call.
+
+    :param calls_per_second: (float) | Rate limit shared by all workers. Throttled and failed calls are retried with backoff.
+    """
+    rate_limiter = fpl_api.RateLimiter(rate=calls_per_second, burst=max_workers)
+    with fpl_api.FPLCalls(pool_maxsize=max_workers, pool_block=True, rate_limiter=rate_limiter) as conn:
+        for league_name, league_id in config["leagues"].items():
+            print(f"League {league_name}")
+            league_standings = standings.StandingsCrawler(league_id, league_type, conn=conn, max_workers=max_workers).crawl()
+            print(f"{sum(league_standings.meta['pages'].values())} entries stored in {league_standings.directory}")
+        print(conn.report)
+
+
+def get_league_managers_and_save(league_id: Union[int, str], gameweek: Union[None, int] = None, max_workers: int = 16,
+                                 calls_per_second: float = 25.0):
+    """ Fetch info, history and picks of every entry of a crawled league into its league_managers.LeagueManagersStore.
+
+    Run get_all_league_standings_and_save first. Managers stored by an earlier run are not fetched again.
+
+    :param league_id: (int) or (str) | ID of the league.
+    :param gameweek: (int) or None | Gameweek of the picks. Defaults to the current gameweek.
+    :param max_workers: (int) | Maximum number of calls in flight at the same time.
+    :param calls_per_second: (float) | Rate limit shared by all workers. Throttled and failed calls are retried with backoff.
+    """
+    rate_limiter = fpl_api.RateLimiter(rate=calls_per_second, burst=max_workers)
+    with fpl_api.FPLCalls(pool_maxsize=max_workers, pool_block=True, rate_limiter=rate_limiter) as conn:
+        if gameweek is None:
+            event_status_call = conn.get_event_status()
+            if event_status_call.status_code != 200:
+                return
+            gameweek = json.loads(event_status_call.text)["status"][0]["event"]
+        store = league_managers.LeagueManagersFetcher(league_id, gameweek, conn=conn, max_workers=max_workers).fetch()
+        print(f"{store.meta['managers']} managers stored in {store.directory}")
+        print(conn.report)
+
+
+def get_all_person_data_and_save_to_json(conn: Union[None, fpl_api.FPLCalls] = None, snapshot: Union[None, sync.SeasonSnapshot] = None):
+    if conn is None:
+        conn = fpl_api.FPLCalls()
+    if snapshot is None:
+        snapshot = sync.SeasonSnapshot.fetch_event_status(conn)
+        if not snapshot:
+            return
     for person_name, person_id in config["managers"].items():
         gw_history = list()
-        for item in range(1, previous_gameweek + 1):
+        for item in range(1, snapshot.previous_gameweek + 1):
             result_call = conn.get_person_picks(person_id, item)
-            result = json.loads(result_call.text)
-            gw_history.append(result)
-        with open(config["settings"]["current_season"] + "/data/managers/" + person_name + "_" + person_id + ".json", 'w') as outfile:
-            outfile.write(json.dumps(gw_history))
+            if result_call.status_code != 200:
+                continue
+            gw_history.append(json.loads(result_call.text))
+        save_person_picks(person_name, person_id, gw_history)
 
 
-def update_persons_jsons(fpl_connection: fpl_api.FPLCalls):
-    event_status_call = conn.get_event_status()
-    if event_status_call.status_code != 200:
-        return
-    event_status = json.loads(event_status_call.text)
-    if event_status["leagues"] == "Updated":
-        previous_gameweek = event_status["status"][0]["event"]
-    else:
-        previous_gameweek = event_status["status"][0]["event"] - 1
-    for person_name, person_id in config["managers"].items():
-        if os.path.exists(config["settings"]["current_season"] + "/data/managers/" + person_name + "_" + person_id + ".json"):
-            with open(config["settings"]["current_season"] + "/data/managers/" + person_name + "_" + person_id + ".json") as file:
-                json_file = json.load(file)
-            gameweeks_in_json = len(json_file)
-            print("Gameweeks found in json:", gameweeks_in_json)
+def save_person_picks(person_name: str, person_id: Union[int, str], gw_history: list):
+    storage.write_json(config["settings"]["current_season"] + "/data/managers/" + person_name + "_" + str(person_id) + ".json", gw_history)
+    database = sqlite_store.get_database()
+    if database is not None:
+        database.save_manager_picks(person_id, gw_history)
+
+
+def get_all_person_info_and_save(conn: Union[None, fpl_api.FPLCalls] = None):
+    if conn is None:
+        conn = fpl_api.FPLCalls()
+    for person_id in config["managers"].values():
+        person_info_call = conn.get_person_info(person_id)
+        if person_info_call.status_code != 200:
+            continue
+        save_person_info(person_id, json.loads(person_info_call.text))
+
+
+def save_person_info(person_id: Union[int, str], person_info: dict):
+    storage.write_json(config["settings"]["current_season"] + "/data/managers/info/" + str(person_id) + ".json", person_info)
+
 
-            if previous_gameweek == gameweeks_in_json:
+def update_persons_jsons(fpl_connection: Union[None, fpl_api.FPLCalls] = None, snapshot: Union[None, sync.SeasonSnapshot] = None):
+    """ Incremental version of get_all_person_data_and_save_to_json.
+
+    Only the gameweeks that are missing from data/managers/<name>_<id>.json, or that were not finished when they were
+    stored, are fetched and merged into the stored list.
+    """
+    if fpl_connection is None:
+        fpl_connection = fpl_api.FPLCalls()
+    if snapshot is None:
+        snapshot = sync.SeasonSnapshot.fetch_event_status(fpl_connection)
+        if not snapshot:
+            return
+    for person_name, person_id in config["managers"].items():
+        gw_history = load_person_picks(person_name, person_id)
+        unavailable_gameweeks = load_unavailable_gameweeks(person_id)
+        missing_gameweeks = get_missing_gameweeks(gw_history, snapshot.previous_gameweek, unavailable_gameweeks, snapshot.last_finished_gameweek)
+        if not missing_gameweeks:
+            continue
+        for item in missing_gameweeks:
+            result_call = fpl_connection.get_person_picks(person_id, item)
+            if result_call.status_code == 404:
+                unavailable_gameweeks.add(item)
+            if result_call.status_code != 200:
                 continue
-            for item in range(gameweeks_in_json + 1, previous_gameweek + 1):
-                result_call = fpl_connection.get_person_picks(person_id, item)
-                result = json.loads(result_call.text)
-                json_file[item] = result
-            with open(config["settings"]["current_season"] + "/data/managers/" + person_name + "_" + person_id + ".json",
-                      'w') as outfile:
-                outfile.write(json.dumps(json_file))
-        else:
-            gw_history = dict()
-            for item in range(1, previous_gameweek + 1):
-                result_call = fpl_connection.get_person_picks(person_id, item)
-                result = json.loads(result_call.text)
-                gw_history[item] = result
-            with open(config["settings"]["current_season"] + "/data/managers/" + person_name + "_" + person_id + ".json",
-                      'w') as outfile:
-                outfile.write(json.dumps(gw_history))
-
-
-def get_entire_gameweek_results_per_player_and_save():
-    conn = fpl_api.FPLCalls()
-    bootstrap_static_call = conn.get_bootstrap_static()
-    if bootstrap_static_call.status_code != 200:
-        return
-    bootstrap_static = json.loads(bootstrap_static_call.text)
+            gw_history[item] = json.loads(result_call.text)
+        save_person_picks(person_name, person_id, [gw_history[item] for item in sorted(gw_history)])
+        save_unavailable_gameweeks(person_id, unavailable_gameweeks)
+
+
+def load_person_picks(person_name: str, person_id: Union[int, str]) -> dict:
+    """ Load the stored picks of a manager, keyed by gameweek.
+
+    Files in the old dict format ({"<gameweek>": picks}) are read as well, so they are rewritten as a list on the next save.
+
+    :return: (dict) | Gameweek mapped to the picks of that gameweek. Empty if no picks are stored.
+    """
+    path = config["settings"]["current_season"] + "/data/managers/" + person_name + "_" + str(person_id) + ".json"
+    if not os.path.exists(path):
+        return dict()
+    with open(path, "r") as file:
+        json_file = json.load(file)
+    if isinstance(json_file, dict):
+        json_file = list(json_file.values())
+    return {event["entry_history"]["event"]: event for event in json_file if "entry_history" in event}
+
+
+def get_missing_gameweeks(gw_history: dict, previous_gameweek: int, unavailable_gameweeks: Iterable[int] = (),
+                          last_finished_gameweek: Union[None, int] = None) -> list:
+    """ Return the gameweeks up to previous_gameweek of which the picks have to be fetched.
+
+    :param last_finished_gameweek: (int) or None | Stored gameweeks after it are fetched again, because their picks
+                                                   (points, automatic substitutions) can still change. None keeps all.
+    """
+    unavailable_gameweeks = set(unavailable_gameweeks)
+    return [gameweek for gameweek in range(1, previous_gameweek + 1)
+            if gameweek not in unavailable_gameweeks
+            and (gameweek not in gw_history or (last_finished_gameweek is not None and gameweek > last_finished_gameweek))]
+
+
+def unavailable_gameweeks_path(person_id: Union[int, str]) -> str:
+    return config["settings"]["current_season"] + "/data/managers/unavailable/" + str(person_id) + ".json"
+
+
+def load_unavailable_gameweeks(person_id: Union[int, str]) -> set:
+    """ Load the gameweeks of which the picks of a manager returned 404, e.g. because the manager joined later. """
+    path = unavailable_gameweeks_path(person_id)
+    if not os.path.exists(path):
+        return set()
+    with open(path, "r") as file:
+        return set(json.load(file))
+
 
-    event_status_call = conn.get_event_status()
-    if event_status_call.status_code != 200:
+def save_unavailable_gameweeks(person_id: Union[int, str], gameweeks: set):
+    if not gameweeks and not os.path.exists(unavailable_gameweeks_path(person_id)):
         return
-    event_status = json.loads(event_status_call.text)
-    if event_status["leagues"] == "Updated":
-        previous_gameweek = event_status["status"][0]["event"]
-    else:
-        previous_gameweek = event_status["status"][0]["event"] - 1
+    storage.write_json(unavailable_gameweeks_path(person_id), sorted(gameweeks))
 
 
-    for player in bootstrap_static["elements"]:
+def get_all_player_summaries_and_save(conn: Union[None, fpl_api.FPLCalls] = None, snapshot: Union[None, sync.SeasonSnapshot] = None):
+    """ Crawl element-summary once for every player and save it both as player file and in the gameweek history. """
+    if conn is None:
+        conn = fpl_api.FPLCalls()
+    if snapshot is None:
+        snapshot = sync.SeasonSnapshot.fetch(conn)
+        if not snapshot:
+            return
+    gameweek_history = sync.GameweekHistoryAccumulator(gameweek_history_directory(), history_columns_directory())
+    for player in snapshot.elements:
         print("Player", player["id"])
         player_summary_call = conn.get_player_summary(player["id"])
         if player_summary_call.status_code != 200:
-            return
-        player_summary = json.loads(player_summary_call.text)
-        for gw in player_summary["history"]:
-            with open(config["settings"]["current_season"] + "/data/players/gameweek_history/gameweek_" + str(gw["round"]) + ".json", "r") as file:
-                gameweek_json = json.load(file)
-            gameweek_json.append(gw)
-            with open(config["settings"]["current_season"] + "/data/players/gameweek_history/gameweek_" + str(
-                    gw["round"]) + ".json", "w") as file:
-                file.write(json.dumps(gameweek_json))
+            continue
+        save_player_summary(player, json.loads(player_summary_call.text), gameweek_history)
+    gameweek_history.flush()
 
 
-def get_entire_player_properties_and_save():
-    conn = fpl_api.FPLCalls()
-    bootstrap_static_call = conn.get_bootstrap_static()
-    if bootstrap_static_call.status_code != 200:
-        return
-    bootstrap_static = json.loads(bootstrap_static_call.text)
+def save_player_summary(player: dict, player_summary: dict, gameweek_history: sync.GameweekHistoryAccumulator):
+    save_player_properties(player, player_summary)
+    save_player_history(player_summary["history"], gameweek_history)
+
+
+def save_player_history(history: list, gameweek_history: sync.GameweekHistoryAccumulator):
+    gameweek_history.add(history)
+    database = sqlite_store.get_database()
+    if database is not None:
+        database.save_element_history(history)
 
-    for player in bootstrap_static["elements"]:
+
+def get_entire_gameweek_results_per_player_and_save(conn: Union[None, fpl_api.FPLCalls] = None, snapshot: Union[None, sync.SeasonSnapshot] = None):
+    if conn is None:
+        conn = fpl_api.FPLCalls()
+    if snapshot is None:
+        snapshot = sync.SeasonSnapshot.fetch(conn)
+        if not snapshot:
+            return
+    gameweek_history = sync.GameweekHistoryAccumulator(gameweek_history_directory(), history_columns_directory())
+    for player in snapshot.elements:
+        print("Player", player["id"])
         player_summary_call = conn.get_player_summary(player["id"])
         if player_summary_call.status_code != 200:
+            continue
+        save_player_history(json.loads(player_summary_call.text)["history"], gameweek_history)
+    gameweek_history.flush()
+
+
+def gameweek_history_directory() -> str:
+    return config["settings"]["current_season"] + "/data/players/gameweek_history/"
+
+
+def history_columns_directory() -> str:
+    return config["settings"]["current_season"] + "/data/players/history_columns"
+
+
+def get_entire_player_properties_and_save(conn: Union[None, fpl_api.FPLCalls] = None, snapshot: Union[None, sync.SeasonSnapshot] = None):
+    if conn is None:
+        conn = fpl_api.FPLCalls()
+    if snapshot is None:
+        snapshot = sync.SeasonSnapshot.fetch(conn)
+        if not snapshot:
             return
-        player_summary = json.loads(player_summary_call.text)
+    for player in snapshot.elements:
+        player_summary_call = conn.get_player_summary(player["id"])
+        if player_summary_call.status_code != 200:
+            continue
         print("Player", player["id"])
-        with open(f"{config['settings']['current_season']}/data/players/{player['id']}_{player['web_name']}.json", "w") as file:
-            file.write(json.dumps(player_summary["history"]))
+        save_player_properties(player, json.loads(player_summary_call.text))
 
 
-def get_all_team_info_and_save():
-    conn = fpl_api.FPLCalls()
-    bootstrap_static_call = conn.get_bootstrap_static()
-    if bootstrap_static_call.status_code != 200:
-        return
-    bootstrap_static = json.loads(bootstrap_static_call.text)
+def save_player_properties(player: dict, player_summary: dict):
+    storage.write_json(f"{config['settings']['current_season']}/data/players/{player['id']}_{player['web_name']}.json", player_summary["history"])
+
+
+def get_all_team_info_and_save(conn: Union[None, fpl_api.FPLCalls] = None, snapshot: Union[None, sync.SeasonSnapshot] = None):
+    if conn is None:
+        conn = fpl_api.FPLCalls()
+    if snapshot is None:
+        snapshot = sync.SeasonSnapshot.fetch(conn)
+        if not snapshot:
+            return
+    save_teams(snapshot.bootstrap_static)
 
+
+def save_teams(bootstrap_static: dict):
     for team in bootstrap_static["teams"]:
-        with open(config["settings"]["current_season"] + "/data/teams/" + str(team["id"]) + "_" + team["name"] + ".json", "w") as file:
-            file.write(json.dumps(team))
-    with open(config["settings"]["current_season"] + "/data/teams/all_teams.json", "w") as file:
-        file.write(json.dumps(bootstrap_static["teams"]))
+        storage.write_json(config["settings"]["current_season"] + "/data/teams/" + str(team["id"]) + "_" + team["name"] + ".json", team)
+    storage.write_json(config["settings"]["current_season"] + "/data/teams/all_teams.json", bootstrap_static["teams"])
+    database = sqlite_store.get_database()
+    if database is not None:
+        database.save_teams(bootstrap_static["teams"])
+
+
+def get_finished_gameweeks_and_save(conn: Union[None, fpl_api.FPLCalls] = None, snapshot: Union[None, sync.SeasonSnapshot] = None):
+    if conn is None:
+        conn = fpl_api.FPLCalls()
+    if snapshot is None:
+        snapshot = sync.SeasonSnapshot.fetch(conn)
+        if not snapshot:
+            return
+    save_finished_gameweeks(snapshot.bootstrap_static)
+    get_player_performances_and_save(conn, snapshot)
 
 
-def get_finished_gameweeks_and_save():
-    conn = fpl_api.FPLCalls()
-    bootstrap_static_call = conn.get_bootstrap_static()
-    if bootstrap_static_call.status_code != 200:
-        return
-    bootstrap_static = json.loads(bootstrap_static_call.text)
+def save_finished_gameweeks(bootstrap_static: dict):
     last_finished_gameweek = 0
     for gameweek in bootstrap_static["events"]:
-        if gameweek["finished"] and gameweek["data_checked"]:
-            with open(config["settings"]["current_season"] + "/data/gameweeks/general/gameweek_" + str(gameweek["id"]) + ".json", "w") as file:
-                file.write(json.dumps(gameweek))
-            if gameweek["id"] > last_finished_gameweek:
-                last_finished_gameweek = gameweek["id"]
+        if not gameweek["finished"] or not gameweek["data_checked"]:
+            continue
+        storage.write_json(config["settings"]["current_season"] + "/data/gameweeks/general/gameweek_" + str(gameweek["id"]) + ".json", gameweek)
+        if gameweek["id"] > last_finished_gameweek:
+            last_finished_gameweek = gameweek["id"]
     config["settings"]["last_finished_gameweek"] = str(last_finished_gameweek)
     save_config()
-    get_player_performances_and_save()
+    database = sqlite_store.get_database()
+    if database is not None:
+        database.save_events(bootstrap_static["events"])
+
+
+def get_player_performances_and_save(conn: Union[None, fpl_api.FPLCalls] = None, snapshot: Union[None, sync.SeasonSnapshot] = None):
+    """ Save the live stats of every finished gameweek that is not stored yet. Use live.LivePoller for the current gameweek. """
+    if conn is None:
+        conn = fpl_api.FPLCalls()
+    if snapshot is None:
+        snapshot = sync.SeasonSnapshot.fetch_event_status(conn)
+        if not snapshot:
+            return
+    for gameweek in snapshot.finished_gameweeks:
+        if os.path.exists(player_performances_path(gameweek["id"])):
+            continue
+        with conn.get_live_player_stats(gameweek["id"], stream=True) as fixture_results_call:
+            if fixture_results_call.status_code != 200:
+                continue
+            save_player_performances_response(gameweek["id"], fixture_results_call)
 
 
-def get_player_performances_and_save():
-    conn = fpl_api.FPLCalls()
-    for gameweek in range(len(os.listdir(config["settings"]["current_season"] + "/data/gameweeks/general/"))):
-        fixture_results_call = conn.get_live_player_stats(gameweek + 1)
-        if fixture_results_call.status_code != 200:
-            continue
-        fixture_results = json.loads(fixture_results_call.text)
-        with open(config["settings"]["current_season"] + "/data/gameweeks/player_performances/gameweek_" + str(gameweek + 1) + ".json", "w") as file:
-            file.write(json.dumps(fixture_results))
+def save_player_performances_response(gameweek: int, response: requests.Response):
+    """ Write the body of an event live response to disk as it is received, without decoding it. """
+    storage.write_chunks(player_performances_path(gameweek), response.iter_content(json_stream.CHUNK_SIZE))
 
 
-def get_all_fixtures_and_save():
-    conn = fpl_api.FPLCalls()
-    fixtures_call = conn.get_fixtures(event=None, only_future_fixtures=False)
-    if fixtures_call.status_code != 200:
-        return
-    fixtures = json.loads(fixtures_call.text)
-    for fixture in fixtures:
-        print(fixture["id"])
-        if fixture["finished"]:
-            with open(config["settings"]["current_season"] + "/data/fixtures/" + str(fixture["id"]) + "-" + str(fixture["team_h"]) + "_" + str(fixture["team_a"]) + "-finished" + ".json", "w") as file:
-                file.write(json.dumps(fixture))
-        else:
-            with open(config["settings"]["current_season"] + "/data/fixtures/" + str(fixture["id"]) + "-" + str(fixture["team_h"]) + "_" + str(fixture["team_a"]) + ".json", "w") as file:
-                file.write(json.dumps(fixture))
-
-
-def get_bootstrap_static_and_save():
-    conn = fpl_api.FPLCalls()
-    bootstrap_static_call = conn.get_bootstrap_static()
-    if bootstrap_static_call.status_code != 200:
+def player_performances_path(gameweek: int) -> str:
+    return config["settings"]["current_season"] + "/data/gameweeks/player_performances/gameweek_" + str(gameweek) + ".json"
+
+
+def get_all_fixtures_and_save(conn: Union[None, fpl_api.FPLCalls] = None):
+    if conn is None:
+        conn = fpl_api.FPLCalls()
+    with conn.get_fixtures(event=None, only_future_fixtures=False, stream=True) as fixtures_call:
+        if fixtures_call.status_code != 200:
+            return
+        save_fixtures_response(fixtures_call)
+
+
+def save_fixtures_response(response: requests.Response):
+    """ Write the body of a fixtures response to disk as it is received, then save the fixtures one at a time from it. """
+    storage.write_chunks(all_fixtures_path(), response.iter_content(json_stream.CHUNK_SIZE))
+    for fixture in json_stream.iter_file_items(all_fixtures_path()):
+        save_fixture(fixture)
+    database = sqlite_store.get_database()
+    if database is not None:
+        database.save_fixtures(json_stream.iter_file_items(all_fixtures_path()))
+
+
+def save_fixture(fixture: dict):
+    if fixture["finished"]:
+        storage.write_json(config["settings"]["current_season"] + "/data/fixtures/" + str(fixture["id"]) + "-" + str(fixture["team_h"]) + "_" + str(fixture["team_a"]) + "-finished" + ".json", fixture)
+    else:
+        storage.write_json(config["settings"]["current_season"] + "/data/fixtures/" + str(fixture["id"]) + "-" + str(fixture["team_h"]) + "_" + str(fixture["team_a"]) + ".json", fixture)
+
+
+def all_fixtures_path() -> str:
+    return config["settings"]["current_season"] + "/data/fixtures/all_fixtures.json"
+
+
+def get_bootstrap_static_and_save(conn: Union[None, fpl_api.FPLCalls] = None, snapshot: Union[None, sync.SeasonSnapshot] = None):
+    if conn is None:
+        conn = fpl_api.FPLCalls()
+    if snapshot is None:
+        with conn.get_bootstrap_static(stream=True) as bootstrap_static_call:
+            if bootstrap_static_call.status_code != 200:
+                return
+            save_bootstrap_static_response(bootstrap_static_call)
         return
-    bootstrap_static = json.loads(bootstrap_static_call.text)
-    with open(f"{config['settings']['current_season']}/data/bootstrap_static.json", "w") as file:
-        file.write(json.dumps(bootstrap_static))
+    save_bootstrap_static(snapshot.bootstrap_static)
+
+
+def save_bootstrap_static(bootstrap_static: dict):
+    storage.write_json(bootstrap_static_path(), bootstrap_static)
+    database = sqlite_store.get_database()
+    if database is not None:
+        database.save_elements(bootstrap_static["elements"])
+        database.save_events(bootstrap_static["events"])
+
+
+def save_bootstrap_static_response(response: requests.Response):
+    """ Write the body of a bootstrap-static response to disk as it is received. The database reads it back one item at a time. """
+    storage.write_chunks(bootstrap_static_path(), response.iter_content(json_stream.CHUNK_SIZE))
+    database = sqlite_store.get_database()
+    if database is not None:
+        database.save_elements(json_stream.iter_file_items(bootstrap_static_path(), "elements"))
+        database.save_events(json_stream.iter_file_items(bootstrap_static_path(), "events"))
+
+
+def bootstrap_static_path() -> str:
+    return f"{config['settings']['current_season']}/data/bootstrap_static.json"
 
 
 if __name__ == '__main__':
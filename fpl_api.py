@@ -1,23 +1,475 @@
+import datetime
+import email.utils
+import hashlib
+import io
+import json
+import os
+import random
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Union
 
+import json_stream
+import storage
+
+
+# Seconds a cached body is used without asking the API. After that it is revalidated with a conditional call.
+DEFAULT_CACHE_TTLS = {
+    "bootstrap-static": 0,
+    "event-status": 0,
+    "element-summary": 300,
+    "picks": 300,
+    "live": 30,
+    "fixtures": 300,
+    "entry": 300,
+    "history": 300,
+    "league": 300,
+    "standings": 60,
+    "dream-team": 300,
+    "most-valuable-teams": 300,
+    "best-classic-private-leagues": 300,
+}
+
+
+class ResponseCache:
+    def __init__(self, directory: str, ttls: Union[None, dict] = None):
+        """ On-disk cache of Fantasy Premier League API responses.
+
+        Every entry stores the body with its ETag and Last-Modified headers. Fresh entries are used without a call,
+        stale entries are revalidated with a conditional call, so unchanged payloads come back as a 304 without a body.
+        Entries stored as immutable are never revalidated.
+
+        :param directory: (str) | Directory in which the entries are stored. It is created if it does not exist.
+        :param ttls: (dict) or None | Endpoint mapped to the seconds an entry stays fresh. Defaults to DEFAULT_CACHE_TTLS.
+        """
+        self._directory = directory
+        self._ttls = dict(DEFAULT_CACHE_TTLS)
+        if ttls:
+            self._ttls.update(ttls)
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def directory(self):
+        return self._directory
+
+    @property
+    def ttls(self):
+        return self._ttls
+
+    @staticmethod
+    def key(url: str, params: Union[None, dict] = None) -> str:
+        prepared_url = requests.Request("GET", url, params=params).prepare().url
+        return hashlib.sha1(prepared_url.encode()).hexdigest()
+
+    def load(self, key: str) -> Union[None, dict]:
+        """ Load the metadata of an entry, or None if the entry is not stored. """
+        try:
+            with open(os.path.join(self.directory, key + ".json"), "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return
+
+    def is_fresh(self, entry: dict, endpoint: Union[None, str]) -> bool:
+        if entry["immutable"]:
+            return True
+        return time.time() - entry["stored_at"] < self.ttls.get(endpoint, 0)
+
+    def store(self, key: str, response: requests.Response, immutable: bool = False) -> dict:
+        """ Store the body and headers of a 200 response. A streamed body is written to disk chunk by chunk. """
+        storage.write_chunks(os.path.join(self.directory, key + ".body"), response.iter_content(json_stream.CHUNK_SIZE), durable=False)
+        return self.refresh(key, {
+            "url": response.url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "encoding": response.encoding,
+            "immutable": immutable,
+        })
+
+    def refresh(self, key: str, entry: dict, immutable: bool = False) -> dict:
+        """ Store entry as (re)validated now. """
+        entry = dict(entry, stored_at=time.time(), immutable=entry["immutable"] or immutable)
+        self._write(key + ".json", json.dumps(entry).encode())
+        return entry
+
+    def to_response(self, key: str, entry: dict, stream: bool = False) -> Union[None, requests.Response]:
+        """ Rebuild a 200 requests.Response from a stored entry, or None if its body is missing.
+
+        :param stream: (bool) | If set to True, the body is not read into memory. It is read from the stored file by
+                                requests.Response.iter_content(), or at once on the first use of content or text.
+        """
+        response = requests.Response()
+        try:
+            if stream:
+                response.raw = CachedBody(io.FileIO(os.path.join(self.directory, key + ".body"), "rb"))
+                response.headers["Content-Length"] = str(os.fstat(response.raw.fileno()).st_size)
+                response.streamed = True
+            else:
+                with open(os.path.join(self.directory, key + ".body"), "rb") as file:
+                    response._content = file.read()
+        except OSError:
+            return
+        response.status_code = 200
+        response.url = entry["url"]
+        response.encoding = entry["encoding"]
+        if entry["etag"]:
+            response.headers["ETag"] = entry["etag"]
+        if entry["last_modified"]:
+            response.headers["Last-Modified"] = entry["last_modified"]
+        response.from_cache = True
+        return response
+
+    def _write(self, name: str, content: bytes):
+        # Entries can be written from several threads, so never expose a half-written file. A lost entry is only a
+        # cache miss, so it is not flushed to disk.
+        storage.write_bytes(os.path.join(self.directory, name), content, durable=False)
+
+
+class CachedBody(io.BufferedReader):
+    """ Body of a cached response, read from its file.
+
+    requests.Response.close() only closes the raw body if it was not read to the end, but it always calls
+    raw.release_conn(), so the file is closed there.
+    """
+
+    def release_conn(self):
+        self.close()
+
+
+class RateLimiter:
+    def __init__(self, rate: float = 10.0, burst: int = 10):
+        """ Thread-safe token bucket shared by all calls that use it.
+
+        :param rate: (float) | Number of calls allowed per second on average.
+        :param burst: (int) | Number of calls that may be done at once after an idle period.
+        """
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        return self._rate
+
+    @property
+    def burst(self):
+        return self._burst
+
+    def acquire(self):
+        """ Take one token, sleeping until one is available. """
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """ Hold back all callers for at least seconds, e.g. after the API answered with a 429. """
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(float(self.burst), self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+
+class RetryPolicy:
+    def __init__(self, retries: int = 5, backoff: float = 0.5, max_backoff: float = 30.0, retry_statuses: tuple = (429, 500, 502, 503, 504)):
+        """ When and how long to wait before a failed call is retried.
+
+        The wait before retry n is a random value between 0 and backoff * 2 ** n (full jitter), capped at max_backoff.
+        A Retry-After header sent by the API is respected instead, also if it is longer than max_backoff.
+
+        :param retries: (int) | Maximum number of retries of one call.
+        :param backoff: (float) | Base of the exponential backoff, in seconds.
+        :param max_backoff: (float) | Maximum wait before a retry, in seconds.
+        :param retry_statuses: (tuple) | Status codes that are retried. Connection errors and timeouts are always retried.
+        """
+        self._retries = retries
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._retry_statuses = retry_statuses
+
+    @property
+    def retries(self):
+        return self._retries
+
+    @property
+    def retry_statuses(self):
+        return self._retry_statuses
+
+    def delay(self, attempt: int, response: Union[None, requests.Response] = None) -> float:
+        retry_after = self.retry_after(response) if response is not None else None
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self._max_backoff, self._backoff * 2 ** attempt))
+
+    @staticmethod
+    def retry_after(response: requests.Response) -> Union[None, float]:
+        """ Return the seconds to wait of the Retry-After header of response, given in seconds or as an HTTP date. """
+        retry_after = response.headers.get("Retry-After", "").strip()
+        if not retry_after:
+            return
+        if retry_after.isdigit():
+            return float(retry_after)
+        try:
+            retry_at = email.utils.parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            return
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+        return max(0.0, (retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+class RequestReport:
+    def __init__(self):
+        """ Thread-safe record of the calls of an FPLCalls object that were throttled, retried or failed. """
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.throttled = list()
+        self.retried = list()
+        self.failed = list()
+
+    def __str__(self):
+        lines = [f"{self.calls} calls, {len(self.throttled)} throttled, {len(self.retried)} retried, {len(self.failed)} failed"]
+        for url, reason in self.failed:
+            lines.append(f"  failed: {url} ({reason})")
+        return "\n".join(lines)
+
+    def add_call(self):
+        with self._lock:
+            self.calls += 1
+
+    def add_throttled(self, url: str):
+        with self._lock:
+            self.throttled.append(url)
+
+    def add_retried(self, url: str, reason: str):
+        with self._lock:
+            self.retried.append((url, reason))
+
+    def add_failed(self, url: str, reason: str):
+        with self._lock:
+            self.failed.append((url, reason))
+
 
 class FPLCalls:
-    def __init__(self, base_url="https://fantasy.premierleague.com/api"):
+    def __init__(self, base_url="https://fantasy.premierleague.com/api", pool_connections: int = 10, pool_maxsize: int = 10,
+                 pool_block: bool = False, keep_alive: bool = True, cache: Union[None, ResponseCache] = None,
+                 rate_limiter: Union[None, RateLimiter] = None, retry_policy: Union[None, RetryPolicy] = None,
+                 timeout: Union[None, float, tuple] = (5.0, 30.0)):
+        """ Client for the Fantasy Premier League API.
+
+        All calls go through one requests.Session, so connections to the API host are pooled and reused instead of
+        doing a new TCP and TLS handshake for every call.
+
+        :param base_url: (str) | Base URL of the Fantasy Premier League API.
+        :param pool_connections: (int) | Number of per-host connection pools to keep.
+        :param pool_maxsize: (int) | Maximum number of connections kept open per host.
+        :param pool_block:
+            (bool) | If set to True, a call waits for a free connection once pool_maxsize connections to a host are in use.
+            If set to False, extra connections are opened but not kept in the pool.
+        :param keep_alive: (bool) | If set to False, every connection is closed after its call.
+        :param cache:
+            (ResponseCache) or None | If given, responses are cached on disk and revalidated with conditional calls.
+            Live player stats and picks of gameweeks up to last_finished_gameweek are cached as immutable.
+        :param rate_limiter: (RateLimiter) or None | If given, every call to the API first takes a token from it.
+        :param retry_policy: (RetryPolicy) or None | Policy for retrying failed calls. Defaults to RetryPolicy().
+        :param timeout:
+            (tuple) or (float) or None | (connect, read) timeout of every call in seconds. A call that times out is
+            retried like a connection error. None waits forever.
+        """
         self._base_url = base_url
+        self._pool_connections = pool_connections
+        self._pool_maxsize = pool_maxsize
+        self._pool_block = pool_block
+        self._keep_alive = keep_alive
+        self._cache = cache
+        self._rate_limiter = rate_limiter
+        self._retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self._timeout = timeout
+        self._report = RequestReport()
+        self._last_finished_gameweek = None
+        self._session = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
 
     @property
     def base_url(self):
         return self._base_url
 
+    @property
+    def pool_connections(self):
+        return self._pool_connections
+
+    @property
+    def pool_maxsize(self):
+        return self._pool_maxsize
+
+    @property
+    def pool_block(self):
+        return self._pool_block
+
+    @property
+    def keep_alive(self):
+        return self._keep_alive
+
+    @property
+    def cache(self):
+        return self._cache
+
+    @property
+    def rate_limiter(self):
+        return self._rate_limiter
+
+    @property
+    def retry_policy(self):
+        return self._retry_policy
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @property
+    def report(self) -> RequestReport:
+        return self._report
+
+    @property
+    def last_finished_gameweek(self):
+        return self._last_finished_gameweek
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            self._session = self.create_session()
+        return self._session
+
     @base_url.setter
     def base_url(self, new_base_url):
         self._base_url = new_base_url
 
+    @timeout.setter
+    def timeout(self, new_timeout: Union[None, float, tuple]):
+        self._timeout = new_timeout
+
+    @last_finished_gameweek.setter
+    def last_finished_gameweek(self, new_last_finished_gameweek: Union[None, int]):
+        self._last_finished_gameweek = new_last_finished_gameweek
+
+    def create_session(self) -> requests.Session:
+        """ Create the pooled session used by all calls of this object.
+
+        :return: (requests.Session) | Session with a pooled HTTPAdapter mounted for http and https.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize, pool_block=self.pool_block)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers["Connection"] = "keep-alive" if self.keep_alive else "close"
+        return session
+
+    def close(self):
+        """ Close all pooled connections. A new session is created on the next call. """
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def is_finished_gameweek(self, gameweek: Union[int, str]) -> bool:
+        return self.last_finished_gameweek is not None and int(gameweek) <= self.last_finished_gameweek
+
+    def _get(self, url: str, params: Union[None, dict] = None, endpoint: Union[None, str] = None, immutable: bool = False,
+             stream: bool = False) -> requests.Response:
+        """ GET url through the cache, if any.
+
+        :param stream: (bool) | If set to True, the body is not loaded into memory. Read it in chunks with
+                                requests.Response.iter_content(), e.g. with storage.write_chunks or json_stream.iter_items.
+                                With a cache, the body is streamed into the cache and read back from there.
+        """
+        if self.cache is None:
+            return self._send(url, params, stream=stream)
+        key = self.cache.key(url, params)
+        entry = self.cache.load(key)
+        headers = dict()
+        if entry:
+            if self.cache.is_fresh(entry, endpoint):
+                cached_response = self.cache.to_response(key, entry, stream)
+                if cached_response is not None:
+                    return cached_response
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+        response = self._send(url, params, headers, stream)
+        if response.status_code == 304 and entry:
+            cached_response = self.cache.to_response(key, entry, stream)
+            if cached_response is not None:
+                self.cache.refresh(key, entry, immutable)
+                return cached_response
+            response = self._send(url, params, stream=stream)
+        if response.status_code == 200:
+            entry = self.cache.store(key, response, immutable)
+            if stream:
+                response.close()
+                stored_response = self.cache.to_response(key, entry, stream)
+                if stored_response is not None:
+                    stored_response.from_cache = False
+                    return stored_response
+        return response
+
+    def _send(self, url: str, params: Union[None, dict] = None, headers: Union[None, dict] = None, stream: bool = False) -> requests.Response:
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            self.report.add_call()
+            response = None
+            try:
+                response = self.session.get(url=url, params=params, headers=headers, stream=stream, timeout=self.timeout)
+                if response.status_code not in self.retry_policy.retry_statuses:
+                    if response.status_code >= 400:
+                        self.report.add_failed(url, f"status {response.status_code}")
+                    response.streamed = stream
+                    return response
+                # Release the connection of a streamed response before retrying.
+                response.close()
+                reason = f"status {response.status_code}"
+                if response.status_code == 429:
+                    self.report.add_throttled(url)
+            except (requests.ConnectionError, requests.Timeout) as error:
+                reason = type(error).__name__
+            if attempt >= self.retry_policy.retries:
+                self.report.add_failed(url, reason)
+                if response is None:
+                    response = requests.Response()
+                    response.status_code = 503
+                    response.reason = reason
+                    response.url = url
+                return response
+            delay = self.retry_policy.delay(attempt, response)
+            self.report.add_retried(url, reason)
+            if response is not None and response.status_code == 429 and self.rate_limiter is not None:
+                # Holds back every caller sharing the limiter, including this one on its next acquire().
+                self.rate_limiter.pause(delay)
+            else:
+                time.sleep(delay)
+            attempt += 1
+
     # API CALLS
-    def get_bootstrap_static(self) -> requests.Response:
+    def get_bootstrap_static(self, stream: bool = False) -> requests.Response:
         """ Get general Fantasy Premier League info about the season
 
+        :param stream: (bool) | If set to True, the body is not loaded into memory, see _get.
+
         :return:
             (requests.Response) | requests.Response.text contains JSON info if the call was successful. The object has a 200 status code if the call succeeds.
                 This JSON contains info about:
@@ -35,7 +487,7 @@ class FPLCalls:
             response.status_code = 404
             return response
         url = f"{self.base_url}/bootstrap-static/"
-        return requests.get(url=url)
+        return self._get(url, endpoint="bootstrap-static", stream=stream)
 
     def get_person_picks(self, person_id: Union[int, str], gameweek: Union[int, str]) -> requests.Response:
         """ Get picks for a specific Fantasy Premier League manager in a specific gameweek.
@@ -56,7 +508,7 @@ class FPLCalls:
             response.status_code = 404
             return response
         url = f"{self.base_url}/entry/{person_id}/event/{gameweek}/picks/"
-        return requests.get(url=url)
+        return self._get(url, endpoint="picks", immutable=self.is_finished_gameweek(gameweek))
 
     def get_player_summary(self, player_id: Union[int, str]) -> requests.Response:
         """ Get summary for a specific Premier League player.
@@ -75,7 +527,7 @@ class FPLCalls:
             response.status_code = 404
             return response
         url = f"{self.base_url}/element-summary/{player_id}/"
-        return requests.get(url=url)
+        return self._get(url, endpoint="element-summary")
 
     def get_event_status(self) -> requests.Response:
         """ Get status of the last or ongoing gameweek.
@@ -92,9 +544,9 @@ class FPLCalls:
             response.status_code = 404
             return response
         url = f"{self.base_url}/event-status"
-        return requests.get(url=url)
+        return self._get(url, endpoint="event-status")
 
-    def get_fixtures(self, event: Union[None, int], only_future_fixtures: bool) -> requests.Response:
+    def get_fixtures(self, event: Union[None, int], only_future_fixtures: bool, stream: bool = False) -> requests.Response:
         """ Get fixtures for games in the season.
 
         :param event:
@@ -103,6 +555,7 @@ class FPLCalls:
         :param only_future_fixtures:
             (bool) | If set to True, only future fixtures will be fetched.
             This parameter only works if parameter event is set to False.
+        :param stream: (bool) | If set to True, the body is not loaded into memory, see _get.
         :return:
             (requests.Response) | requests.Response.text contains JSON info if the call was successful. The object has a 200 status code if the call succeeds.
                 This JSON contains info about:
@@ -121,12 +574,13 @@ class FPLCalls:
         if only_future_fixtures:
             params = {"future": 1}
         url = f"{self.base_url}/fixtures"
-        return requests.get(url=url, params=params)
+        return self._get(url, params=params, endpoint="fixtures", stream=stream)
 
-    def get_live_player_stats(self, gameweek: Union[int, str]) -> requests.Response:
+    def get_live_player_stats(self, gameweek: Union[int, str], stream: bool = False) -> requests.Response:
         """ Get all Premier League player performances within a specific gameweek.
 
         :param gameweek: (int) or (str) | gameweek. Values 1 to 38.
+        :param stream: (bool) | If set to True, the body is not loaded into memory, see _get.
         :return:
             (requests.Response) | requests.Response.text contains JSON info if the call was successful. The object has a 200 status code if the call succeeds.
                 This JSON contains info about:
@@ -138,7 +592,7 @@ class FPLCalls:
             response.status_code = 404
             return response
         url = f"{self.base_url}/event/{gameweek}/live/"
-        return requests.get(url=url)
+        return self._get(url, endpoint="live", immutable=self.is_finished_gameweek(gameweek), stream=stream)
 
     def get_classic_league_details(self, league_id: Union[int, str]) -> requests.Response:
         """ Get classic league information bases on a league ID.
@@ -155,7 +609,7 @@ class FPLCalls:
             response.status_code = 404
             return response
         url = f"{self.base_url}/leagues-classic/{league_id}/"
-        return requests.get(url=url)
+        return self._get(url, endpoint="league")
 
     def get_classic_league_standings(self, league_id: Union[int, str], page_new_entries: Union[int, str, None], page_standings: Union[int, str, None], phase: Union[int, str, None]) -> requests.Response:
         """ Get standings of a specific classic league.
@@ -183,8 +637,8 @@ class FPLCalls:
         if page_standings:
             params["page_standings"] = page_standings
         if phase:
-            params["page_standings"] = page_standings
-        return requests.get(url=url, params=params)
+            params["phase"] = phase
+        return self._get(url, params=params, endpoint="standings")
 
     def get_h2h_league_standings(self, league_id: Union[int, str], page_new_entries: Union[int, str, None], page_standings: Union[int, str, None], phase: Union[int, str, None]) -> requests.Response:
         """ Get standings of a specific Head To Head (H2H) league.
@@ -212,8 +666,8 @@ class FPLCalls:
         if page_standings:
             params["page_standings"] = page_standings
         if phase:
-            params["page_standings"] = page_standings
-        return requests.get(url=url, params=params)
+            params["phase"] = phase
+        return self._get(url, params=params, endpoint="standings")
 
     def get_person_info(self, person_id: Union[int, str]) -> requests.Response:
         """ Get info about a Fantasy Premier League manager.
@@ -234,7 +688,7 @@ class FPLCalls:
             response.status_code = 404
             return response
         url = f"{self.base_url}/entry/{person_id}/"
-        return requests.get(url=url)
+        return self._get(url, endpoint="entry")
 
     def get_person_history(self, person_id: Union[int, str]) -> requests.Response:
         """ Get history about a Fantasy Premier League manager.
@@ -253,7 +707,7 @@ class FPLCalls:
             response.status_code = 404
             return response
         url = f"{self.base_url}/entry/{person_id}/history/"
-        return requests.get(url=url)
+        return self._get(url, endpoint="history")
 
     def get_dream_team(self, gameweek: Union[int, str]) -> requests.Response:
         """ Get dream team for a specific gameweek.
@@ -271,7 +725,7 @@ class FPLCalls:
             response.status_code = 404
             return response
         url = f"{self.base_url}/dream-team/{gameweek}/"
-        return requests.get(url=url)
+        return self._get(url, endpoint="dream-team", immutable=self.is_finished_gameweek(gameweek))
 
     def get_most_valuable_teams(self) -> requests.Response:
         """ Get the top 10 most valuable teams of the moment across Fantasy Premier League.
@@ -287,7 +741,7 @@ class FPLCalls:
             response.status_code = 404
             return response
         url = f"{self.base_url}/stats/most-valuable-teams/"
-        return requests.get(url=url)
+        return self._get(url, endpoint="most-valuable-teams")
 
     def get_best_classic_private_leagues(self) -> requests.Response:
         """ Get the top 10 private classic leagues based on the average score of the top 5 teams in those leagues.
@@ -303,4 +757,4 @@ class FPLCalls:
             response.status_code = 404
             return response
         url = f"{self.base_url}/stats/best-classic-private-leagues/"
-        return requests.get(url=url)
+        return self._get(url, endpoint="best-classic-private-leagues")
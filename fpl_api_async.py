@@ -0,0 +1,240 @@
+import asyncio
+import aiohttp
+import requests
+from typing import Dict, Iterable, Union
+
+
+class AsyncFPLCalls:
+    def __init__(self, base_url="https://fantasy.premierleague.com/api", max_concurrency: int = 20, limit_per_host: int = 20,
+                 timeout: Union[None, float, tuple] = (5.0, 30.0)):
+        """ asyncio counterpart of fpl_api.FPLCalls.
+
+        Every call returns a requests.Response, just like FPLCalls, so results can be handled by the same code.
+        At most max_concurrency calls are in flight at the same time, no matter how many are scheduled.
+        The object has to be used as an async context manager, or closed with close():
+
+            async with AsyncFPLCalls() as conn:
+                summaries = await conn.get_player_summaries(player_ids)
+
+        :param base_url: (str) | Base URL of the Fantasy Premier League API.
+        :param max_concurrency: (int) | Maximum number of calls in flight at the same time.
+        :param limit_per_host: (int) | Maximum number of open connections per host.
+        :param timeout:
+            (tuple) or (float) or None | (connect, read) timeout of every call in seconds, as in fpl_api.FPLCalls.
+            A call that fails or times out returns a response with status code 503. None waits forever.
+        """
+        self._base_url = base_url
+        self._max_concurrency = max_concurrency
+        self._limit_per_host = limit_per_host
+        self._timeout = timeout
+        self._semaphore = None
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    @property
+    def base_url(self):
+        return self._base_url
+
+    @property
+    def max_concurrency(self):
+        return self._max_concurrency
+
+    @property
+    def limit_per_host(self):
+        return self._limit_per_host
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @base_url.setter
+    def base_url(self, new_base_url):
+        self._base_url = new_base_url
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, limit_per_host=self.limit_per_host)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.client_timeout())
+        return self._session
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def client_timeout(self) -> aiohttp.ClientTimeout:
+        if self.timeout is None:
+            return aiohttp.ClientTimeout(total=None)
+        connect_timeout, read_timeout = self.timeout if isinstance(self.timeout, tuple) else (self.timeout, self.timeout)
+        return aiohttp.ClientTimeout(total=None, sock_connect=connect_timeout, sock_read=read_timeout)
+
+    async def close(self):
+        """ Close the underlying aiohttp session and all of its connections. """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _get(self, url: str, params: Union[None, dict] = None) -> requests.Response:
+        async with self.semaphore:
+            try:
+                async with self.session.get(url, params=params) as api_response:
+                    content = await api_response.read()
+                    response = requests.Response()
+                    response.status_code = api_response.status
+                    response.url = str(api_response.url)
+                    response.headers.update(api_response.headers)
+                    response.encoding = api_response.get_encoding() if content else None
+                    response._content = content
+                    return response
+            except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+                return self._failed(url, type(error).__name__)
+
+    @staticmethod
+    def _not_found() -> requests.Response:
+        response = requests.Response()
+        response.status_code = 404
+        return response
+
+    @staticmethod
+    def _failed(url: str, reason: str) -> requests.Response:
+        """ Response of a call that raised, with status code 503 like fpl_api.FPLCalls. """
+        response = requests.Response()
+        response.status_code = 503
+        response.reason = reason
+        response.url = url
+        response._content = b""
+        return response
+
+    async def _gather(self, calls: list, urls: list) -> list:
+        """ Await calls concurrently. A call that raises gives a 503 response instead of failing all the others. """
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        responses = list()
+        for url, result in zip(urls, results):
+            if isinstance(result, Exception):
+                result = self._failed(url, type(result).__name__)
+            elif isinstance(result, BaseException):
+                raise result
+            responses.append(result)
+        return responses
+
+    # API CALLS
+    async def get_bootstrap_static(self) -> requests.Response:
+        """ Get general Fantasy Premier League info about the season. See fpl_api.FPLCalls.get_bootstrap_static. """
+        if not self.base_url:
+            return self._not_found()
+        return await self._get(f"{self.base_url}/bootstrap-static/")
+
+    async def get_event_status(self) -> requests.Response:
+        """ Get status of the last or ongoing gameweek. See fpl_api.FPLCalls.get_event_status. """
+        if not self.base_url:
+            return self._not_found()
+        return await self._get(f"{self.base_url}/event-status")
+
+    async def get_person_picks(self, person_id: Union[int, str], gameweek: Union[int, str]) -> requests.Response:
+        """ Get picks for a Fantasy Premier League manager in a gameweek. See fpl_api.FPLCalls.get_person_picks. """
+        if not self.base_url or not person_id or not gameweek:
+            return self._not_found()
+        return await self._get(f"{self.base_url}/entry/{person_id}/event/{gameweek}/picks/")
+
+    async def get_person_info(self, person_id: Union[int, str]) -> requests.Response:
+        """ Get info about a Fantasy Premier League manager. See fpl_api.FPLCalls.get_person_info. """
+        if not self.base_url or not person_id:
+            return self._not_found()
+        return await self._get(f"{self.base_url}/entry/{person_id}/")
+
+    async def get_person_history(self, person_id: Union[int, str]) -> requests.Response:
+        """ Get history about a Fantasy Premier League manager. See fpl_api.FPLCalls.get_person_history. """
+        if not self.base_url or not person_id:
+            return self._not_found()
+        return await self._get(f"{self.base_url}/entry/{person_id}/history/")
+
+    async def get_player_summary(self, player_id: Union[int, str]) -> requests.Response:
+        """ Get summary for a Premier League player. See fpl_api.FPLCalls.get_player_summary. """
+        if not self.base_url or not player_id:
+            return self._not_found()
+        return await self._get(f"{self.base_url}/element-summary/{player_id}/")
+
+    async def get_live_player_stats(self, gameweek: Union[int, str]) -> requests.Response:
+        """ Get all Premier League player performances within a gameweek. See fpl_api.FPLCalls.get_live_player_stats. """
+        if not self.base_url or not gameweek:
+            return self._not_found()
+        return await self._get(f"{self.base_url}/event/{gameweek}/live/")
+
+    async def get_fixtures(self, event: Union[None, int], only_future_fixtures: bool) -> requests.Response:
+        """ Get fixtures for games in the season. See fpl_api.FPLCalls.get_fixtures. """
+        if not self.base_url:
+            return self._not_found()
+        params = {}
+        if event:
+            if event not in range(1, 39):
+                raise ValueError(f"Event {event} is not a value from 1 to 38")
+            params["event"] = event
+        if only_future_fixtures:
+            params = {"future": 1}
+        return await self._get(f"{self.base_url}/fixtures", params=params)
+
+    async def get_classic_league_standings(self, league_id: Union[int, str], page_new_entries: Union[int, str, None], page_standings: Union[int, str, None], phase: Union[int, str, None]) -> requests.Response:
+        """ Get standings of a classic league. See fpl_api.FPLCalls.get_classic_league_standings. """
+        if not self.base_url or not league_id:
+            return self._not_found()
+        return await self._get(f"{self.base_url}/leagues-classic/{league_id}/standings/", params=self._standings_params(page_new_entries, page_standings, phase))
+
+    async def get_h2h_league_standings(self, league_id: Union[int, str], page_new_entries: Union[int, str, None], page_standings: Union[int, str, None], phase: Union[int, str, None]) -> requests.Response:
+        """ Get standings of a Head To Head (H2H) league. See fpl_api.FPLCalls.get_h2h_league_standings. """
+        if not self.base_url or not league_id:
+            return self._not_found()
+        return await self._get(f"{self.base_url}/leagues-h2h/{league_id}/standings/", params=self._standings_params(page_new_entries, page_standings, phase))
+
+    @staticmethod
+    def _standings_params(page_new_entries: Union[int, str, None], page_standings: Union[int, str, None], phase: Union[int, str, None]) -> dict:
+        params = dict()
+        if page_new_entries:
+            params["page_new_entries"] = page_new_entries
+        if page_standings:
+            params["page_standings"] = page_standings
+        if phase:
+            params["phase"] = phase
+        return params
+
+    # BULK CALLS
+    async def get_player_summaries(self, player_ids: Iterable[Union[int, str]]) -> Dict[Union[int, str], requests.Response]:
+        """ Get the summaries of many Premier League players concurrently.
+
+        :param player_ids: (iterable) | IDs of the Premier League players.
+        :return: (dict) | Player ID mapped to its requests.Response.
+        """
+        player_ids = list(player_ids)
+        responses = await self._gather([self.get_player_summary(player_id) for player_id in player_ids],
+                                       [f"{self.base_url}/element-summary/{player_id}/" for player_id in player_ids])
+        return dict(zip(player_ids, responses))
+
+    async def get_persons_picks(self, person_ids: Iterable[Union[int, str]], gameweeks: Iterable[Union[int, str]]) -> Dict[tuple, requests.Response]:
+        """ Get the picks of many Fantasy Premier League managers in many gameweeks concurrently.
+
+        :param person_ids: (iterable) | IDs of the Fantasy Premier League managers.
+        :param gameweeks: (iterable) | Gameweeks. Values 1 to 38.
+        :return: (dict) | (person ID, gameweek) mapped to its requests.Response.
+        """
+        gameweeks = list(gameweeks)
+        keys = [(person_id, gameweek) for person_id in person_ids for gameweek in gameweeks]
+        responses = await self._gather([self.get_person_picks(person_id, gameweek) for person_id, gameweek in keys],
+                                       [f"{self.base_url}/entry/{person_id}/event/{gameweek}/picks/" for person_id, gameweek in keys])
+        return dict(zip(keys, responses))
+
+    async def get_live_player_stats_for_gameweeks(self, gameweeks: Iterable[Union[int, str]]) -> Dict[Union[int, str], requests.Response]:
+        """ Get the live player stats of many gameweeks concurrently.
+
+        :param gameweeks: (iterable) | Gameweeks. Values 1 to 38.
+        :return: (dict) | Gameweek mapped to its requests.Response.
+        """
+        gameweeks = list(gameweeks)
+        responses = await self._gather([self.get_live_player_stats(gameweek) for gameweek in gameweeks],
+                                       [f"{self.base_url}/event/{gameweek}/live/" for gameweek in gameweeks])
+        return dict(zip(gameweeks, responses))
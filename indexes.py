@@ -0,0 +1,326 @@
+import configparser
+import json
+import os
+import threading
+from typing import Union
+
+import columnar
+
+config = configparser.ConfigParser()
+config.read("conf/config.ini")
+
+
+class StoredDataIndex:
+    def __init__(self, path: str):
+        """ Process-wide index over stored season data, built lazily on first use.
+
+        The index is rebuilt when the modification time or size of path changes, so lookups always reflect the
+        stored data without parsing it again for every lookup.
+
+        :param path: (str) | File or directory the index is built from.
+        """
+        self._path = path
+        self._signature = None
+        self._index = None
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        return self._path
+
+    def signature(self) -> Union[None, tuple]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        return stat.st_mtime_ns, stat.st_size
+
+    def index(self):
+        """ Return the index, (re)building it if the stored data changed since it was built.
+
+        :raise FileNotFoundError: If path does not exist.
+        """
+        signature = self.signature()
+        if signature is None:
+            raise FileNotFoundError(f"File {self.path} not found")
+        if signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    self._index = self.build()
+                    self._signature = signature
+        return self._index
+
+    def invalidate(self):
+        self._signature = None
+        self._index = None
+
+    def build(self):
+        raise NotImplementedError
+
+
+class PlayerIndex(StoredDataIndex):
+    def build(self) -> dict:
+        with open(self.path, "r") as file:
+            bootstrap_static = json.load(file)
+        by_id = dict()
+        by_web_name = dict()
+        for player in bootstrap_static["elements"]:
+            by_id[player["id"]] = player
+            by_web_name.setdefault(player["web_name"].lower(), player)
+        return {"id": by_id, "web_name": by_web_name}
+
+    def get(self, player_id: Union[int, str]) -> Union[None, dict]:
+        """ Return the bootstrap-static element of a Premier League player, or None if it is not found. """
+        return self.index()["id"].get(int(player_id))
+
+    def get_by_web_name(self, web_name: str) -> Union[None, dict]:
+        return self.index()["web_name"].get(web_name.lower())
+
+
+class TeamRegistry(StoredDataIndex):
+    def build(self) -> dict:
+        with open(self.path, "r") as file:
+            teams = json.load(file)
+        by_id = dict()
+        by_name = dict()
+        for team in teams:
+            by_id[team["id"]] = team
+            by_name[team["name"].lower()] = team
+            by_name[team["short_name"].lower()] = team
+        return {"all": teams, "id": by_id, "name": by_name}
+
+    def all(self) -> list:
+        return list(self.index()["all"])
+
+    def get(self, team_id: Union[int, str]) -> Union[None, dict]:
+        return self.index()["id"].get(int(team_id))
+
+    def get_by_name(self, team_name: str) -> Union[None, dict]:
+        """ Return a team by its name or short name, case insensitive, or None if it is not found. """
+        return self.index()["name"].get(team_name.lower())
+
+
+class PicksIndex(StoredDataIndex):
+    def build(self) -> dict:
+        with open(self.path, "r") as file:
+            manager_season_history = json.load(file)
+        if isinstance(manager_season_history, dict):
+            manager_season_history = list(manager_season_history.values())
+        return {event["entry_history"]["event"]: event for event in manager_season_history if "entry_history" in event}
+
+    def get(self, gameweek: Union[int, str]) -> Union[None, dict]:
+        return self.index().get(int(gameweek))
+
+
+class HistoryColumnsIndex(StoredDataIndex):
+    def __init__(self, directory: str):
+        """ Process-wide columnar.ColumnarHistory of the stored gameweek history, reopened when the store is rewritten.
+
+        :param directory: (str) | Directory of the columnar store, written by columnar.write_history_columns.
+        """
+        super().__init__(directory)
+
+    @property
+    def index_path(self):
+        return os.path.join(self.path, "index.json")
+
+    def signature(self) -> Union[None, tuple]:
+        try:
+            stat = os.stat(self.index_path)
+        except OSError:
+            return
+        return stat.st_mtime_ns, stat.st_size
+
+    def build(self) -> columnar.ColumnarHistory:
+        return columnar.ColumnarHistory(self.path)
+
+    def is_newer_than(self, *paths: str) -> bool:
+        """ Return True if the store exists and was written after every existing file in paths. """
+        signature = self.signature()
+        if signature is None:
+            return False
+        return all(signature[0] >= os.stat(path).st_mtime_ns for path in paths if os.path.exists(path))
+
+
+class GameweekHistoryIndex(StoredDataIndex):
+    def __init__(self, directory: str, history_columns: Union[None, HistoryColumnsIndex] = None):
+        """ Index built from the stored gameweek_N.json files in directory. It is rebuilt when one of them changes.
+
+        If history_columns is given and its columnar store is up to date with the gameweek files, build_from_columns()
+        is used instead of build(), so the JSON files are not parsed.
+
+        :param directory: (str) | Directory holding the stored gameweek_N.json files.
+        :param history_columns: (HistoryColumnsIndex) or None | Columnar store of the same rows.
+        """
+        super().__init__(directory)
+        self._history_columns = history_columns
+        self._directory_mtime = None
+        self._files_signature = None
+
+    @property
+    def history_columns(self):
+        return self._history_columns
+
+    def gameweek_paths(self) -> list:
+        return [os.path.join(self.path, f"gameweek_{gameweek}.json") for gameweek in range(1, 39)]
+
+    def signature(self) -> Union[None, tuple]:
+        """ Signature of the gameweek files and the columnar store.
+
+        The gameweek files are only stat'ed again when the modification time of the directory changed. The files are
+        written with storage.write_json, which replaces them, so every write changes the directory.
+        """
+        try:
+            directory_mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return
+        if directory_mtime != self._directory_mtime:
+            self._files_signature = self.files_signature()
+            self._directory_mtime = directory_mtime
+        if self.history_columns is None:
+            return self._files_signature
+        return self._files_signature + (self.history_columns.signature(),)
+
+    def invalidate(self):
+        super().invalidate()
+        self._directory_mtime = None
+
+    def files_signature(self) -> tuple:
+        signature = list()
+        for path in self.gameweek_paths():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                signature.append(None)
+                continue
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def index(self):
+        signature = self.signature()
+        if signature is None:
+            raise FileNotFoundError(f"File {self.path} not found")
+        if signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    columns = self.load_columns()
+                    self._index = self.build() if columns is None else self.build_from_columns(columns)
+                    self._signature = signature
+        return self._index
+
+    def load_columns(self) -> Union[None, columnar.ColumnarHistory]:
+        """ Return the columnar store of the history rows, or None if it is missing, empty or older than a gameweek file.
+
+        An empty store, e.g. at the start of a season, has no columns at all, so it is never handed to build_from_columns.
+        """
+        if self.history_columns is None or not self.history_columns.is_newer_than(*self.gameweek_paths()):
+            return
+        columns = self.history_columns.index()
+        if not len(columns):
+            return
+        return columns
+
+    def load_rows(self):
+        """ Yield every stored history row. Duplicate rows of the same (element, fixture) are yielded once. """
+        for path in self.gameweek_paths():
+            if not os.path.exists(path):
+                continue
+            with open(path, "r") as file:
+                rows = {(row["element"], row["fixture"]): row for row in json.load(file)}
+            for row in rows.values():
+                yield row
+
+    def build_from_columns(self, columns: columnar.ColumnarHistory):
+        return self.build()
+
+
+class PointsStore(GameweekHistoryIndex):
+    """ Season points of every Premier League player, keyed by (element, round). Rows of a double gameweek are summed. """
+
+    def build(self) -> dict:
+        points = dict()
+        for row in self.load_rows():
+            key = (row["element"], row["round"])
+            points[key] = points.get(key, 0) + row["total_points"]
+        return points
+
+    def build_from_columns(self, columns: columnar.ColumnarHistory) -> dict:
+        points = dict()
+        for element, gameweek, total_points in zip(columns.column("element").tolist(), columns.column("round").tolist(),
+                                                   columns.column("total_points").tolist()):
+            key = (element, gameweek)
+            points[key] = points.get(key, 0) + total_points
+        return points
+
+    def get(self, element: Union[int, str], gameweek: Union[int, str]) -> int:
+        """ Return the points of element in gameweek, 0 if it did not play. """
+        return self.index().get((int(element), int(gameweek)), 0)
+
+
+class FixtureRepository(StoredDataIndex):
+    def __init__(self, directory: str):
+        """ Index over the stored fixtures, with lookup by ID, by (home team ID, away team ID) and by event.
+
+        It is built from all_fixtures.json in directory. If that file is not stored yet, it is built from the separate
+        fixture files instead. The returned fixture dicts are shared, so they must not be modified.
+
+        :param directory: (str) | Directory holding the stored fixtures.
+        """
+        super().__init__(directory)
+
+    @property
+    def all_fixtures_path(self):
+        return os.path.join(self.path, "all_fixtures.json")
+
+    def signature(self) -> Union[None, tuple]:
+        try:
+            stat = os.stat(self.all_fixtures_path)
+        except OSError:
+            return super().signature()
+        return "all_fixtures", stat.st_mtime_ns, stat.st_size
+
+    def build(self) -> dict:
+        if os.path.exists(self.all_fixtures_path):
+            with open(self.all_fixtures_path, "r") as file:
+                fixtures = json.load(file)
+        else:
+            fixtures = list()
+            # A finished fixture is stored next to its older unfinished file, so read the finished files last.
+            for file_name in sorted(os.listdir(self.path), key=lambda name: name.endswith("-finished.json")):
+                if file_name.split("-")[0].isdigit():
+                    with open(os.path.join(self.path, file_name), "r") as file:
+                        fixtures.append(json.load(file))
+        by_id = dict()
+        for fixture in fixtures:
+            by_id[fixture["id"]] = fixture
+        by_teams = dict()
+        by_event = dict()
+        for fixture in sorted(by_id.values(), key=lambda item: item["id"]):
+            by_teams.setdefault((fixture["team_h"], fixture["team_a"]), fixture)
+            by_event.setdefault(fixture["event"], list()).append(fixture)
+        return {"id": by_id, "teams": by_teams, "event": by_event}
+
+    def get(self, fixture_id: Union[int, str]) -> Union[None, dict]:
+        return self.index()["id"].get(int(fixture_id))
+
+    def get_by_teams(self, home_team_id: int, away_team_id: int) -> Union[None, dict]:
+        return self.index()["teams"].get((int(home_team_id), int(away_team_id)))
+
+    def get_by_event(self, event: Union[None, int, str]) -> list:
+        """ Return the fixtures of a gameweek, ordered by ID. Fixtures that are not scheduled yet have event None. """
+        return list(self.index()["event"].get(int(event) if event is not None else None, list()))
+
+
+team_registry = TeamRegistry(f"{config['settings']['current_season']}/data/teams/all_teams.json")
+player_index = PlayerIndex(f"{config['settings']['current_season']}/data/bootstrap_static.json")
+history_columns = HistoryColumnsIndex(f"{config['settings']['current_season']}/data/players/history_columns")
+points_store = PointsStore(f"{config['settings']['current_season']}/data/players/gameweek_history", history_columns)
+fixture_repository = FixtureRepository(f"{config['settings']['current_season']}/data/fixtures")
+picks_indexes = dict()
+
+
+def get_picks_index(path: str) -> PicksIndex:
+    """ Return the process-wide PicksIndex of a stored manager picks file. """
+    if path not in picks_indexes:
+        picks_indexes[path] = PicksIndex(path)
+    return picks_indexes[path]
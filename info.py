@@ -1,19 +1,19 @@
 import os
 from typing import Union
-import fpl_api
-import json
+import numpy as np
 import configparser
 import __init__
+import captaincy
 import data
+import indexes
+import season_stats
+import sqlite_store
 from classes import PremierLeaguePlayer, FantasyPremierLeagueManager, League, Fixture, Team
 
 config = configparser.ConfigParser()
 config.read("conf/config.ini")
 
-player_stats = ["total_points", "minutes", "goals_scored", "assists", "clean_sheets", "goals_conceded", "own_goals",
-             "penalties_saved", "penalties_missed", "yellow_cards", "red_cards", "saves", "bonus", "bps", "influence",
-             "creativity", "threat", "ict_index", "value", "transfers_balance", "selected", "transfers_in",
-             "transfers_out"]
+player_stats = season_stats.player_stats
 
 fixture_stats = ["goals_scored", "assists", "own_goals", "penalties_saved", "penalties_missed", "yellow_cards",
                  "red_cards", "saves", "bonus", "bps"]
@@ -45,53 +45,38 @@ def replace_all_player_ids_with_players_in_stats(stat: dict):
     return stat
 
 
+def get_team_records() -> list:
+    """ Return the team dicts of bootstrap-static, from the SQLite database if it is enabled. """
+    database = sqlite_store.get_database()
+    return database.get_teams() if database is not None else indexes.team_registry.all()
+
 
 def get_all_teams():
-    bootstrap_static_call = fpl_api.FPLCalls().get_bootstrap_static()
-    if bootstrap_static_call.status_code != 200:
-        return
-    bootstrap_static = json.loads(bootstrap_static_call.text)
     teams = list()
-    for team in bootstrap_static["teams"]:
+    for team in get_team_records():
         teams.append(team["name"].lower())
         teams.append(team["short_name"].lower())
     return teams
 
 
 def get_all_team_ids():
-    bootstrap_static_call = fpl_api.FPLCalls().get_bootstrap_static()
-    if bootstrap_static_call.status_code != 200:
-        return
-    bootstrap_static = json.loads(bootstrap_static_call.text)
-    teams = list()
-    for team in bootstrap_static["teams"]:
-        teams.append(team["id"])
-    return teams
+    return [team["id"] for team in get_team_records()]
 
 
 def team_name_to_id(team_name: str):
-    teams = get_all_teams()
-    if team_name.lower() not in teams:
+    database = sqlite_store.get_database()
+    team = database.get_team_by_name(team_name) if database is not None else indexes.team_registry.get_by_name(team_name)
+    if not team:
         raise ValueError(f"Team {team_name.lower()} not found.")
-    bootstrap_static_call = fpl_api.FPLCalls().get_bootstrap_static()
-    if bootstrap_static_call.status_code != 200:
-        return
-    bootstrap_static = json.loads(bootstrap_static_call.text)
-    for team in bootstrap_static["teams"]:
-        if team_name.lower() in [team["name"].lower(), team["short_name"].lower()]:
-            return team["id"]
+    return team["id"]
 
 
 def player_web_name_to_id(web_name: str) -> Union[None, int]:
-    conn = fpl_api.FPLCalls()
-    bootstrap_static_call = conn.get_bootstrap_static()
-    if bootstrap_static_call.status_code != 200:
-        return
-    bootstrap_static_json = json.loads(bootstrap_static_call.text)
-    for item in bootstrap_static_json["elements"]:
-        if item["web_name"].lower() == web_name.lower():
-            return item["id"]
-    return None
+    database = sqlite_store.get_database()
+    player = database.get_element_by_web_name(web_name) if database is not None else indexes.player_index.get_by_web_name(web_name)
+    if not player:
+        return None
+    return player["id"]
 
 
 def get_person_captain_for_gameweek(manager: FantasyPremierLeagueManager, gameweek: Union[int, str]) -> Union[None, list]:
@@ -116,40 +101,23 @@ def get_person_captain_for_gameweek(manager: FantasyPremierLeagueManager, gamewe
 
 
 def get_points_for_player(player: PremierLeaguePlayer, gameweek: Union[int, str]) -> Union[None, int]:
-    player_summary = player.get_summary()
-    if not player_summary:
-        return
-    total = 0
-    for gw in player_summary:
-        if gw["round"] == gameweek:
-            total += gw["total_points"]
-    return total
+    database = sqlite_store.get_database()
+    if database is not None:
+        return database.get_points(player.id, gameweek)
+    return indexes.points_store.get(player.id, gameweek)
 
 
 def get_extra_captaincy_points_between_gws(manager: FantasyPremierLeagueManager, lower_gw: Union[int, str], upper_gw: Union[int, str]) -> Union[None, list]:
-    result = list()
-    for gameweek in range(lower_gw, upper_gw + 1):
-        captain = get_person_captain_for_gameweek(manager, gameweek)
-        if type(captain) is list:
-            if captain[0] is not None:
-                if captain[3]:
-                    result.append(get_points_for_player(captain[0], gameweek) * 2)
-                else:
-                    result.append(get_points_for_player(captain[0], gameweek))
-            else:
-                result.append(0)
-        else:
-            return
-    return result
+    table = captaincy.build_captaincy_table({manager.nickname: manager.id}, int(lower_gw), int(upper_gw))
+    return table.extra_points(manager.nickname, lower_gw, upper_gw)
 
 
 def get_player_stats_in_gw(player: PremierLeaguePlayer, gameweek: Union[int, str]) -> Union[None, list]:
-    if not player.stats:
-        player.stats = player.get_summary()
-    if not player.stats:
+    player_summary = player.get_summary()
+    if not player_summary:
         return
     stats = list()
-    for element in player.stats["history"]:
+    for element in player_summary:
         if element["round"] == int(gameweek):
             stats.append(element)
     return stats
@@ -159,63 +127,78 @@ def get_player_stat_per_90_minutes(player: PremierLeaguePlayer, stat: str) -> Un
     global player_stats
     if stat not in player_stats:
         raise ValueError(f"Stat {stat} not one of {player_stats}")
-    if not player.stats:
-        player.stats = player.get_summary()
-    if not player.stats:
+    matrix = season_stats.season_stats.index()
+    row = matrix.row(player.id)
+    if row is None:
         return
-    stat_total = 0
-    minutes = 0
-    if stat in ["influence", "creativity", "threat", "ict_index"]:
-        for game in player.stats["history"]:
-            stat_total += float(game[stat])
-            minutes += game["minutes"]
-    else:
-        for game in player.stats["history"]:
-            stat_total += game[stat]
-            minutes += game["minutes"]
-    return stat_total / minutes * 90
+    value = matrix.per_90(stat)[row]
+    return None if np.isnan(value) else float(value)
 
 
 def get_player_stat_per_game(player: PremierLeaguePlayer, stat: str) -> Union[None, float]:
     global player_stats
     if stat not in player_stats:
         raise ValueError(f"Stat {stat} not one of {player_stats}")
-    if not player.stats:
-        player.stats = player.get_summary()
-    if not player.stats:
+    matrix = season_stats.season_stats.index()
+    row = matrix.row(player.id)
+    if row is None:
         return
-    stat_total = 0
-    games = 0
-    if stat in ["influence", "creativity", "threat", "ict_index"]:
-        for game in player.stats["history"]:
-            if game["minutes"] > 0:
-                stat_total += float(game[stat])
-                games += 1
-    else:
-        for game in player.stats["history"]:
-            if game["minutes"] > 0:
-                stat_total += game[stat]
-                games += 1
-    return stat_total / games
+    value = matrix.per_game(stat)[row]
+    return None if np.isnan(value) else float(value)
+
+
+def get_stat_leaderboard(stat: str, metric: str = "per_90", top: int = 10, min_minutes: int = 0) -> list:
+    """ Return the top players of the season for one stat.
+
+    :param stat: (str) | One of player_stats.
+    :param metric: (str) | One of "total", "per_90" or "per_game".
+    :param top: (int) | Number of players returned.
+    :param min_minutes: (int) | Leave out players with fewer season minutes.
+    :return: (list) | (PremierLeaguePlayer, value) pairs, highest value first.
+    """
+    metrics = ["total", "per_90", "per_game"]
+    if metric not in metrics:
+        raise ValueError(f"Metric {metric} not one of {metrics}")
+    matrix = season_stats.season_stats.index()
+    values = getattr(matrix, metric)(stat)
+    return [(PremierLeaguePlayer(element), value) for element, value in matrix.leaderboard(values, top, min_minutes)]
 
 
 def get_fixture(home_team: Team, away_team: Team) -> Union[None, Fixture]:
-    fixtures_call = fpl_api.FPLCalls().get_fixtures(event=None, only_future_fixtures=False)
-    if fixtures_call.status_code != 200:
+    database = sqlite_store.get_database()
+    fixture = database.get_fixture_by_teams(home_team.id, away_team.id) if database is not None else indexes.fixture_repository.get_by_teams(home_team.id, away_team.id)
+    if not fixture:
         return
-    fixtures = json.loads(fixtures_call.text)
-    for fixture in fixtures:
-        if fixture["team_h"] == home_team.id and fixture["team_a"] == away_team.id:
-            return Fixture(fixture["id"])
-    return
+    return Fixture(fixture["id"])
+
+
+def get_captains_between_gws(lower_gameweek: int, upper_gameweek: int) -> dict:
+    """ Return the captain of every manager in config.ini per gameweek between two gameweeks, both included.
+
+    :return: (dict) | Manager nickname mapped to a dict of gameweek to captain element ID.
+    """
+    if not config["managers"]:
+        raise KeyError("No managers found in config.ini")
+    captains = {manager: dict() for manager in config["managers"]}
+    database = sqlite_store.get_database()
+    if database is not None:
+        managers = {int(manager_id): manager for manager, manager_id in config["managers"].items()}
+        for manager_id, gameweek, element, _ in database.get_captains(lower_gameweek, upper_gameweek, list(managers)):
+            captains[managers[manager_id]][gameweek] = element
+        return captains
+    table = captaincy.build_captaincy_table(dict(config["managers"].items()), lower_gameweek, upper_gameweek)
+    for (manager, gameweek), record in table.records.items():
+        captains[manager][gameweek] = record.captain
+    return captains
 
 
 def get_captaincy_points_per_manager(lower_gameweek: int, upper_gameweek: int) -> dict:
+    if not config["managers"]:
+        raise KeyError("No managers found in config.ini")
+    table = captaincy.build_captaincy_table(dict(config["managers"].items()), lower_gameweek, upper_gameweek)
     points = dict()
     for manager in config["managers"]:
-        points[manager] = get_extra_captaincy_points_between_gws(FantasyPremierLeagueManager(config["managers"][manager]), lower_gameweek, upper_gameweek)
-    if points == dict():
-        raise KeyError("No managers found in config.ini")
+        points[manager] = table.extra_points(manager, lower_gameweek, upper_gameweek)
     return points
 
 
@@ -232,7 +215,7 @@ def get_all_used_players_per_manager():
     result = dict()
     for manager in config['managers']:
         player_list = list()
-        players = get_all_used_players(FantasyPremierLeagueManager(config['managers'][manager]), 1, 38)
+        players = get_all_used_players(FantasyPremierLeagueManager(config["managers"][manager], offline=True), 1, 38)
         for player in players:
             player_list.append(PremierLeaguePlayer(player).web_name)
         result[manager] = {
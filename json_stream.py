@@ -0,0 +1,112 @@
+import codecs
+import functools
+import json
+from typing import Iterable, Iterator, Union
+
+CHUNK_SIZE = 65536
+
+decoder = json.JSONDecoder()
+
+
+class ChunkReader:
+    def __init__(self, chunks: Iterable[Union[bytes, str]]):
+        """ Buffer over an iterable of JSON text chunks, of which only the part that is not parsed yet is kept.
+
+        :param chunks: (iterable) | Chunks of UTF-8 encoded bytes or str, e.g. requests.Response.iter_content().
+        """
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._position = 0
+        self._finished = False
+
+    def fill(self, count: int = 1) -> bool:
+        """ Read count more chunks into the buffer. Return False if there was nothing left to read. """
+        if self._finished:
+            return False
+        if self._position > CHUNK_SIZE:
+            self._buffer = self._buffer[self._position:]
+            self._position = 0
+        parts = [self._buffer]
+        for _ in range(count):
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._finished = True
+                parts.append(self._utf8.decode(b"", final=True))
+                break
+            parts.append(self._utf8.decode(chunk) if isinstance(chunk, bytes) else chunk)
+        self._buffer = "".join(parts)
+        return True
+
+    def next_character(self) -> str:
+        """ Skip whitespace and return the next character without consuming it, or "" at the end of the input. """
+        while True:
+            while self._position < len(self._buffer) and self._buffer[self._position] in " \t\n\r":
+                self._position += 1
+            if self._position < len(self._buffer) or not self.fill():
+                return self._buffer[self._position:self._position + 1]
+
+    def expect(self, characters: str) -> str:
+        character = self.next_character()
+        if not character or character not in characters:
+            raise ValueError(f"Expected one of {characters!r} at position {self._position}, found {character!r}")
+        self._position += 1
+        return character
+
+    def value(self):
+        """ Decode and consume the next JSON value. """
+        self.next_character()
+        count = 1
+        while True:
+            try:
+                value, end = decoder.raw_decode(self._buffer, self._position)
+            except json.JSONDecodeError:
+                if not self.fill(count):
+                    raise
+                count *= 2
+                continue
+            # A number or literal at the end of the buffer may continue in the next chunk.
+            if end == len(self._buffer) and self.fill(count):
+                count *= 2
+                continue
+            self._position = end
+            return value
+
+
+def iter_items(chunks: Iterable[Union[bytes, str]], key: Union[None, str] = None) -> Iterator:
+    """ Yield the items of a JSON array one at a time, without decoding the whole document.
+
+    Only one item is decoded at a time, so memory use does not grow with the size of the array.
+
+    :param chunks: (iterable) | Chunks of the JSON document, e.g. requests.Response.iter_content(json_stream.CHUNK_SIZE).
+    :param key: (str) or None | If None, the document is an array. Otherwise the document is an object and the items of
+                                the array under key are yielded, e.g. "elements" for bootstrap-static or live payloads.
+    :raise KeyError: If key is not found in the document.
+    :raise ValueError: If the document is not valid JSON of the expected shape.
+    """
+    reader = ChunkReader(chunks)
+    if key is not None:
+        reader.expect("{")
+        if reader.next_character() == "}":
+            raise KeyError(f"Key {key} not found")
+        while True:
+            current_key = reader.value()
+            reader.expect(":")
+            if current_key == key:
+                break
+            reader.value()
+            if reader.expect(",}") == "}":
+                raise KeyError(f"Key {key} not found")
+    reader.expect("[")
+    if reader.next_character() == "]":
+        return
+    while True:
+        yield reader.value()
+        if reader.expect(",]") == "]":
+            return
+
+
+def iter_file_items(path: str, key: Union[None, str] = None) -> Iterator:
+    """ Yield the items of a stored JSON array one at a time. See iter_items. """
+    with open(path, "rb") as file:
+        yield from iter_items(iter(functools.partial(file.read, CHUNK_SIZE), b""), key)
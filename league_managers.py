@@ -0,0 +1,265 @@
+import io
+import json
+import os
+from typing import Dict, Union
+
+import numpy as np
+
+import fpl_api
+import standings
+import storage
+import sync
+
+# Chip codes of the chips array. 0 means no chip was played.
+CHIPS = {"wildcard": 1, "freehit": 2, "bboost": 3, "3xc": 4}
+
+
+class ManagerRecord:
+    def __init__(self, entry: int):
+        """ Compact data of one manager, filled from the info, history and picks calls of LeagueManagersFetcher. """
+        self.entry = entry
+        self.info = None
+        self.history = None
+        self.picks = None
+
+    @property
+    def complete(self) -> bool:
+        return self.info is not None and self.history is not None and self.picks is not None
+
+    def set_info(self, info: dict):
+        self.info = {"name": info.get("name", ""),
+                     "player_name": f"{info.get('player_first_name', '')} {info.get('player_last_name', '')}".strip(),
+                     "overall_points": info.get("summary_overall_points") or 0,
+                     "overall_rank": info.get("summary_overall_rank") or 0}
+
+    def set_history(self, history: dict):
+        gameweeks = {stat: np.zeros(38, dtype=np.int32) for stat in ("points", "total_points", "overall_rank", "value", "bank", "event_transfers_cost", "points_on_bench")}
+        chips = np.zeros(38, dtype=np.int8)
+        for event in history.get("current", list()):
+            for stat, values in gameweeks.items():
+                values[event["event"] - 1] = event.get(stat) or 0
+        for chip in history.get("chips", list()):
+            chips[chip["event"] - 1] = CHIPS.get(chip["name"], 0)
+        self.history = dict(gameweeks, chips=chips)
+
+    def set_picks(self, picks: dict):
+        ordered_picks = sorted(picks["picks"], key=lambda pick: pick["position"])
+        elements = np.zeros(15, dtype=np.int16)
+        multipliers = np.zeros(15, dtype=np.int8)
+        for index, pick in enumerate(ordered_picks[:15]):
+            elements[index] = pick["element"]
+            multipliers[index] = pick["multiplier"]
+        self.picks = {"has_picks": True, "elements": elements, "multipliers": multipliers,
+                      "captain": next((pick["element"] for pick in ordered_picks if pick["is_captain"]), 0),
+                      "vice_captain": next((pick["element"] for pick in ordered_picks if pick["is_vice_captain"]), 0),
+                      "active_chip": CHIPS.get(picks.get("active_chip"), 0)}
+
+    def set_no_picks(self):
+        """ Store empty picks for a manager without picks in the gameweek, e.g. because the manager joined after it. """
+        self.picks = {"has_picks": False, "elements": np.zeros(15, dtype=np.int16), "multipliers": np.zeros(15, dtype=np.int8),
+                      "captain": 0, "vice_captain": 0, "active_chip": 0}
+
+
+class LeagueManagersStore:
+    def __init__(self, directory: str):
+        """ Managers of a league stored as compressed chunks of typed arrays, one row per manager.
+
+        Every chunk is a .npz file written atomically at a checkpoint. It holds the entry, names, overall points and rank,
+        captain, vice-captain and active chip of every manager, an N x 15 array of picked elements and multipliers, and
+        N x 38 history_* arrays with the points, total points, overall rank, value, bank, transfer costs, bench points
+        and chip (CHIPS code) of every gameweek. has_picks is False for managers without picks in the gameweek, whose
+        picks are all 0. meta.json lists the chunks, so an interrupted fetch keeps every chunk written before the
+        interruption, and the unavailable entries of which the info or history returned 404.
+
+        :param directory: (str) | Directory of the store. It is created if it does not exist.
+        """
+        self._directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._meta = self.load_meta()
+
+    @property
+    def directory(self):
+        return self._directory
+
+    @property
+    def meta(self) -> dict:
+        return self._meta
+
+    @property
+    def meta_path(self):
+        return os.path.join(self.directory, "meta.json")
+
+    def load_meta(self) -> dict:
+        try:
+            with open(self.meta_path, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {"chunks": list(), "managers": 0, "unavailable": list()}
+
+    def write_chunk(self, records: list):
+        """ Store records as a new chunk and record it in meta.json. """
+        if not records:
+            return
+        arrays = {
+            "entry": np.array([record.entry for record in records], dtype=np.int64),
+            "name": np.array([record.info["name"] for record in records], dtype=np.str_),
+            "player_name": np.array([record.info["player_name"] for record in records], dtype=np.str_),
+            "overall_points": np.array([record.info["overall_points"] for record in records], dtype=np.int32),
+            "overall_rank": np.array([record.info["overall_rank"] for record in records], dtype=np.int64),
+            "captain": np.array([record.picks["captain"] for record in records], dtype=np.int16),
+            "vice_captain": np.array([record.picks["vice_captain"] for record in records], dtype=np.int16),
+            "active_chip": np.array([record.picks["active_chip"] for record in records], dtype=np.int8),
+            "has_picks": np.array([record.picks["has_picks"] for record in records], dtype=np.bool_),
+            "elements": np.stack([record.picks["elements"] for record in records]),
+            "multipliers": np.stack([record.picks["multipliers"] for record in records]),
+        }
+        for stat in records[0].history:
+            arrays[f"history_{stat}"] = np.stack([record.history[stat] for record in records])
+        content = io.BytesIO()
+        np.savez_compressed(content, **arrays)
+        chunk = f"chunk_{len(self._meta['chunks']) + 1:05d}.npz"
+        storage.write_bytes(os.path.join(self.directory, chunk), content.getvalue())
+        self._meta["chunks"].append(chunk)
+        self._meta["managers"] += len(records)
+        storage.write_json(self.meta_path, self._meta)
+
+    def mark_unavailable(self, entry: int):
+        """ Record an entry of which the info or history returned 404, so it is not fetched again. """
+        self._meta.setdefault("unavailable", list()).append(entry)
+        storage.write_json(self.meta_path, self._meta)
+
+    def stored_entries(self) -> set:
+        """ Return the entries in the chunks and the unavailable entries. """
+        entries = set(self._meta.get("unavailable", list()))
+        for chunk in self._meta["chunks"]:
+            with np.load(os.path.join(self.directory, chunk)) as arrays:
+                entries.update(arrays["entry"].tolist())
+        return entries
+
+    def load(self) -> Dict[str, np.ndarray]:
+        """ Return every array over all chunks, one row per manager. history_* arrays have one column per gameweek. """
+        arrays = dict()
+        for chunk in self._meta["chunks"]:
+            with np.load(os.path.join(self.directory, chunk)) as chunk_arrays:
+                for name in chunk_arrays.files:
+                    arrays.setdefault(name, list()).append(chunk_arrays[name])
+        return {name: np.concatenate(parts) for name, parts in arrays.items()}
+
+
+class LeagueManagersFetcher:
+    def __init__(self, league_id: Union[int, str], gameweek: int, conn: Union[None, fpl_api.FPLCalls] = None,
+                 store: Union[None, LeagueManagersStore] = None, max_workers: int = 16, checkpoint_size: int = 500,
+                 calls_per_second: float = 25.0):
+        """ Fetches info, history and the picks of gameweek for every entry of a crawled league.
+
+        The entries are read from the standings.StandingsStore of the league, so crawl the standings first. The calls
+        run on a sync.SyncEngine with at most max_workers calls in flight. Every checkpoint_size complete managers are
+        written to the store as one chunk. A new fetch skips the managers already in the store, so an interrupted fetch
+        resumes where it stopped. Managers of which a call failed or returned an unreadable payload are not stored, so
+        they are fetched again. Managers without picks in gameweek (404) are stored with empty picks, and managers of
+        which the info or history returned 404 are recorded as unavailable, so neither is fetched again.
+
+        :param league_id: (int) or (str) | ID of the league.
+        :param gameweek: (int) | Gameweek of the picks.
+        :param conn: (fpl_api.FPLCalls) or None | Connection used for the calls. Size its pool to max_workers and give it
+                                                  an fpl_api.RateLimiter.
+        :param store: (LeagueManagersStore) or None | Defaults to the store of the league and gameweek in the current season.
+        :param max_workers: (int) | Maximum number of calls in flight at the same time.
+        :param checkpoint_size: (int) | Number of managers per stored chunk.
+        :param calls_per_second: (float) | Rate limit shared by all workers if conn is None.
+        """
+        self._league_id = league_id
+        self._gameweek = gameweek
+        if conn is None:
+            conn = fpl_api.FPLCalls(pool_maxsize=max_workers, pool_block=True, rate_limiter=fpl_api.RateLimiter(rate=calls_per_second, burst=max_workers))
+        self._conn = conn
+        self._store = store if store is not None else LeagueManagersStore(managers_directory(league_id, gameweek))
+        self._max_workers = max_workers
+        self._checkpoint_size = checkpoint_size
+        self._records = dict()
+        self._completed = list()
+        self._engine = None
+
+    @property
+    def league_id(self):
+        return self._league_id
+
+    @property
+    def gameweek(self):
+        return self._gameweek
+
+    @property
+    def conn(self):
+        return self._conn
+
+    @property
+    def store(self):
+        return self._store
+
+    def fetch(self, entries: Union[None, list] = None) -> LeagueManagersStore:
+        """ Fetch every entry that is not stored yet and return the store.
+
+        :param entries: (list) or None | Entry IDs to fetch. Defaults to the entries of the crawled league standings.
+        :raise ValueError: If entries is None and the standings of the league are not crawled completely.
+        """
+        if entries is None:
+            standings_store = standings.StandingsStore(standings.standings_directory(self.league_id))
+            if not standings_store.complete:
+                raise ValueError(f"Standings of league {self.league_id} are not crawled completely. Run standings.StandingsCrawler first.")
+            entries = standings_store.entry_ids()
+        stored_entries = self.store.stored_entries()
+        engine = self._engine = sync.SyncEngine(max_workers=self._max_workers)
+        for entry in entries:
+            if entry in stored_entries:
+                continue
+            record = self._records.setdefault(entry, ManagerRecord(entry))
+            engine.add("manager_info", self.conn.get_person_info, (entry,), lambda response, record=record: self.handle(record, record.set_info, response, "manager_info"),
+                       lambda response, record=record: self.handle_missing_manager(record, response))
+            engine.add("manager_history", self.conn.get_person_history, (entry,), lambda response, record=record: self.handle(record, record.set_history, response, "manager_history"),
+                       lambda response, record=record: self.handle_missing_manager(record, response))
+            engine.add("manager_picks", self.conn.get_person_picks, (entry, self.gameweek), lambda response, record=record: self.handle(record, record.set_picks, response, "manager_picks"),
+                       lambda response, record=record: self.handle_missing_picks(record, response))
+        print(f"Fetching {len(self._records)} of {len(entries)} managers of league {self.league_id}...")
+        try:
+            with storage.fsync_batch():
+                engine.run()
+        finally:
+            self.checkpoint(force=True)
+        engine.print_summary()
+        return self.store
+
+    def handle(self, record: ManagerRecord, setter, response, stage: str):
+        try:
+            setter(json.loads(response.content))
+        except (ValueError, KeyError, TypeError, IndexError) as error:
+            # The record stays incomplete, so the manager is fetched again by the next fetch.
+            print(f"Manager {record.entry}: unreadable response of {response.url} ({error!r})")
+            if self._engine is not None:
+                self._engine.summaries[stage].failed += 1
+            return
+        self.complete(record)
+
+    def handle_missing_picks(self, record: ManagerRecord, response):
+        if response.status_code == 404:
+            record.set_no_picks()
+            self.complete(record)
+
+    def handle_missing_manager(self, record: ManagerRecord, response):
+        if response.status_code == 404 and record.entry in self._records:
+            del self._records[record.entry]
+            self.store.mark_unavailable(record.entry)
+
+    def complete(self, record: ManagerRecord):
+        if record.complete and record.entry in self._records:
+            del self._records[record.entry]
+            self._completed.append(record)
+            self.checkpoint()
+
+    def checkpoint(self, force: bool = False):
+        if self._completed and (force or len(self._completed) >= self._checkpoint_size):
+            self.store.write_chunk(self._completed)
+            self._completed = list()
+
+
+def managers_directory(league_id: Union[int, str], gameweek: int) -> str:
+    return os.path.join(os.path.dirname(standings.standings_directory(league_id)), f"managers_gameweek_{gameweek}")
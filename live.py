@@ -0,0 +1,171 @@
+import json
+import threading
+import time
+from typing import Callable, Dict, Iterable, Union
+
+import requests
+
+import fpl_api
+import json_stream
+
+
+class ElementDelta:
+    def __init__(self, element: int, stats: dict, previous_stats: Union[None, dict]):
+        """ Change of the live stats of one element between two polls.
+
+        :param element: (int) | Element ID.
+        :param stats: (dict) | Live stats of the element in the new poll.
+        :param previous_stats: (dict) or None | Live stats of the element in the previous poll. None if it is new.
+        """
+        self.element = element
+        self.stats = stats
+        self.previous_stats = previous_stats
+
+    def __repr__(self):
+        return f"ElementDelta({self.element}, {self.changes})"
+
+    @property
+    def changes(self) -> dict:
+        """ Return the changed stats, mapped to their difference for numbers or to their new value otherwise. """
+        previous_stats = self.previous_stats or dict()
+        changes = dict()
+        for stat, value in self.stats.items():
+            previous_value = previous_stats.get(stat)
+            if value == previous_value:
+                continue
+            if isinstance(value, (int, float)) and isinstance(previous_value, (int, float)) and not isinstance(value, bool):
+                changes[stat] = value - previous_value
+            else:
+                changes[stat] = value
+        return changes
+
+    @property
+    def points_delta(self) -> int:
+        return self.stats.get("total_points", 0) - (self.previous_stats or dict()).get("total_points", 0)
+
+
+def read_live_stats(elements: Iterable[dict]) -> Dict[int, dict]:
+    """ Map every element of an event live payload to its stats. """
+    return {element["id"]: element["stats"] for element in elements}
+
+
+def diff_live_stats(previous: Dict[int, dict], current: Dict[int, dict]) -> Dict[int, ElementDelta]:
+    """ Return the elements whose stats differ between two polls, keyed by element ID. """
+    return {element: ElementDelta(element, stats, previous.get(element)) for element, stats in current.items() if previous.get(element) != stats}
+
+
+class LivePoller:
+    def __init__(self, conn: Union[None, fpl_api.FPLCalls] = None, gameweek: Union[None, int] = None, interval: float = 30.0):
+        """ Polls the live stats of a gameweek and pushes the elements that changed to subscribers.
+
+        Every poll streams the event live payload and compares the stats of every element with the previous poll.
+        Subscribers are only called if something changed, with the ElementDelta of the changed elements. A response with
+        the same ETag as the previous poll is not parsed at all.
+
+        If conn uses a fpl_api.ResponseCache, give it a "live" TTL of 0, so every poll revalidates with a conditional
+        call instead of reusing the cached payload.
+
+        :param conn: (fpl_api.FPLCalls) or None | Connection used for the calls. A new one is made if None.
+        :param gameweek: (int) or None | Gameweek to poll. If None, the current gameweek of event-status is polled.
+        :param interval: (float) | Seconds between the start of two polls in run().
+        """
+        self._conn = conn if conn is not None else fpl_api.FPLCalls()
+        self._gameweek = gameweek
+        self._interval = interval
+        self._stats = dict()
+        self._etag = None
+        self._subscribers = list()
+        self._stop = threading.Event()
+
+    @property
+    def conn(self):
+        return self._conn
+
+    @property
+    def gameweek(self):
+        if self._gameweek is None:
+            self._gameweek = self.get_current_gameweek()
+        return self._gameweek
+
+    @property
+    def interval(self):
+        return self._interval
+
+    @property
+    def stats(self) -> Dict[int, dict]:
+        """ Live stats of every element in the last poll, keyed by element ID. """
+        return self._stats
+
+    @gameweek.setter
+    def gameweek(self, new_gameweek: int):
+        if new_gameweek != self._gameweek:
+            self._stats = dict()
+            self._etag = None
+        self._gameweek = new_gameweek
+
+    @interval.setter
+    def interval(self, new_interval: float):
+        self._interval = new_interval
+
+    def get_current_gameweek(self) -> int:
+        event_status_call = self.conn.get_event_status()
+        if event_status_call.status_code != 200:
+            raise ConnectionError(f"Event status call returned {event_status_call.status_code}")
+        return json.loads(event_status_call.text)["status"][0]["event"]
+
+    def subscribe(self, callback: Callable[[int, Dict[int, ElementDelta]], None]):
+        """ Call callback(gameweek, deltas) after every poll in which at least one element changed. """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[int, Dict[int, ElementDelta]], None]):
+        self._subscribers.remove(callback)
+
+    def poll(self) -> Dict[int, ElementDelta]:
+        """ Poll the live stats once and notify the subscribers of the changed elements.
+
+        :return: (dict) | ElementDelta of every changed element, keyed by element ID. Empty if nothing changed or the call failed.
+        """
+        gameweek = self.gameweek
+        with self.conn.get_live_player_stats(gameweek, stream=True) as live_call:
+            if live_call.status_code != 200:
+                return dict()
+            etag = live_call.headers.get("ETag")
+            if etag is not None and etag == self._etag:
+                return dict()
+            current = self.read_response(live_call)
+        deltas = diff_live_stats(self._stats, current)
+        self._stats = current
+        self._etag = etag
+        if deltas:
+            for callback in list(self._subscribers):
+                # A failing subscriber does not keep the others from being notified.
+                try:
+                    callback(gameweek, deltas)
+                except Exception as error:
+                    print(f"Live subscriber {callback!r} raised {error!r}")
+        return deltas
+
+    @staticmethod
+    def read_response(response: requests.Response) -> Dict[int, dict]:
+        return read_live_stats(json_stream.iter_items(response.iter_content(json_stream.CHUNK_SIZE), "elements"))
+
+    def run(self, max_polls: Union[None, int] = None):
+        """ Poll every interval seconds until stop() is called or max_polls polls are done.
+
+        A poll that fails while the body is read or decoded is logged and the next poll is done as usual.
+        """
+        polls = 0
+        while not self._stop.is_set() and (max_polls is None or polls < max_polls):
+            start = time.monotonic()
+            try:
+                self.poll()
+            except (requests.RequestException, ValueError, KeyError) as error:
+                print(f"Live poll of gameweek {self._gameweek} failed: {error!r}")
+            polls += 1
+            if max_polls is not None and polls >= max_polls:
+                break
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - start)))
+        self._stop.clear()
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,238 @@
+import configparser
+from typing import Dict, Iterable, List, Union
+
+import indexes
+
+config = configparser.ConfigParser()
+config.read("conf/config.ini")
+
+GOALKEEPER = 1
+DEFENDER = 2
+MIDFIELDER = 3
+FORWARD = 4
+# Minimum number of players per element type in a starting XI.
+MINIMUM_FORMATION = {GOALKEEPER: 1, DEFENDER: 3, MIDFIELDER: 2, FORWARD: 1}
+# Maximum number of players per element type in a starting XI.
+MAXIMUM_FORMATION = {GOALKEEPER: 1, DEFENDER: 5, MIDFIELDER: 5, FORWARD: 3}
+
+
+class ManagerTeam:
+    def __init__(self, manager_id: int, name: str, picks: list, active_chip: Union[None, str] = None, previous_total: int = 0,
+                 transfers_cost: int = 0):
+        """ Team of one manager in one gameweek, as picked before the deadline.
+
+        :param manager_id: (int) | ID of the manager.
+        :param name: (str) | Name shown in the standings.
+        :param picks: (list) | Picks of the picks endpoint, ordered by position. Positions 12 to 15 are the bench.
+        :param active_chip: (str) or None | "bboost", "3xc" or another chip of the gameweek.
+        :param previous_total: (int) | Total points of the manager before the gameweek.
+        :param transfers_cost: (int) | Points deducted for transfers in the gameweek.
+        """
+        self.manager_id = manager_id
+        self.name = name
+        self.picks = sorted(picks, key=lambda pick: pick["position"])
+        self.active_chip = active_chip
+        self.previous_total = previous_total
+        self.transfers_cost = transfers_cost
+        self.elements = [pick["element"] for pick in self.picks]
+        self.captain = next((pick["element"] for pick in self.picks if pick["is_captain"]), None)
+        self.vice_captain = next((pick["element"] for pick in self.picks if pick["is_vice_captain"]), None)
+
+    @classmethod
+    def from_picks(cls, manager_id: Union[int, str], name: str, picks: dict) -> "ManagerTeam":
+        """ Build a team from a payload of the picks endpoint, as stored by data.get_all_person_data_and_save_to_json. """
+        entry_history = picks["entry_history"]
+        transfers_cost = entry_history.get("event_transfers_cost", 0)
+        previous_total = entry_history.get("total_points", 0) - (entry_history.get("points", 0) - transfers_cost)
+        return cls(int(manager_id), name, picks["picks"], picks.get("active_chip"), previous_total, transfers_cost)
+
+    @property
+    def captain_multiplier(self) -> int:
+        return 3 if self.active_chip == "3xc" else 2
+
+
+class LiveLeagueTable:
+    def __init__(self, teams: Iterable[ManagerTeam], elements: Union[None, Dict[int, dict]] = None):
+        """ Live projected standings of many managers in one gameweek.
+
+        Live points are computed with the captain multiplier (the vice-captain's if the captain did not play), triple
+        captain, bench boost and automatic substitutions. A player did not play if he has no minutes and all fixtures of
+        his team in the gameweek are finished; until update_fixtures() is called no fixture counts as finished.
+        Automatic substitutions use the bench players that already played minutes, in bench order, as long as the
+        formation stays within MINIMUM_FORMATION and MAXIMUM_FORMATION.
+
+        A reverse index from element to managers is kept, so after a poll only the managers holding a changed element
+        are recomputed. Subscribe apply_live_deltas to a live.LivePoller to keep the table current.
+
+        :param teams: (iterable) | ManagerTeam of every manager.
+        :param elements: (dict) or None | bootstrap-static elements keyed by ID, for their team and element type.
+                                          Defaults to the stored bootstrap-static of indexes.player_index.
+        """
+        self._teams = {team.manager_id: team for team in teams}
+        self._elements = elements if elements is not None else indexes.player_index.index()["id"]
+        self._stats = dict()
+        self._pending_teams = None
+        self._points = dict()
+        self._managers_by_element = dict()
+        self._elements_by_team = dict()
+        for team in self._teams.values():
+            for element in team.elements:
+                self._managers_by_element.setdefault(element, set()).add(team.manager_id)
+        for element in self._managers_by_element:
+            if element in self._elements:
+                self._elements_by_team.setdefault(self._elements[element]["team"], set()).add(element)
+        self.recompute(self._teams)
+
+    @property
+    def teams(self) -> Dict[int, ManagerTeam]:
+        return self._teams
+
+    @property
+    def points(self) -> Dict[int, int]:
+        """ Live points in the gameweek per manager ID, after transfer costs. """
+        return self._points
+
+    def managers_holding(self, elements: Iterable[int]) -> set:
+        """ Return the IDs of the managers that picked one of elements, bench included. """
+        managers = set()
+        for element in elements:
+            managers.update(self._managers_by_element.get(element, ()))
+        return managers
+
+    def apply_live_deltas(self, gameweek: int, deltas: dict) -> set:
+        """ Apply the changed elements of a live.LivePoller poll and recompute the managers holding them.
+
+        :param gameweek: (int) | Gameweek of the poll.
+        :param deltas: (dict) | live.ElementDelta of every changed element, keyed by element ID.
+        :return: (set) | IDs of the recomputed managers.
+        """
+        return self.update_stats({element: delta.stats for element, delta in deltas.items()})
+
+    def update_stats(self, stats: Dict[int, dict]) -> set:
+        """ Store the live stats of the given elements and recompute the managers holding one of them. """
+        self._stats.update(stats)
+        managers = self.managers_holding(stats)
+        self.recompute(managers)
+        return managers
+
+    def update_fixtures(self, fixtures: Iterable[dict]) -> set:
+        """ Store which fixtures of the gameweek are finished and recompute the managers affected by a change.
+
+        :param fixtures: (iterable) | All fixtures of the gameweek, e.g. from FPLCalls.get_fixtures(gameweek, False).
+        :return: (set) | IDs of the recomputed managers.
+        """
+        pending_teams = set()
+        for fixture in fixtures:
+            if not (fixture.get("finished") or fixture.get("finished_provisional")):
+                pending_teams.update((fixture["team_h"], fixture["team_a"]))
+        if self._pending_teams is None:
+            changed_teams = set(self._elements_by_team) - pending_teams
+        else:
+            changed_teams = self._pending_teams ^ pending_teams
+        self._pending_teams = pending_teams
+        elements = set()
+        for team in changed_teams:
+            elements.update(self._elements_by_team.get(team, ()))
+        managers = self.managers_holding(elements)
+        self.recompute(managers)
+        return managers
+
+    def recompute(self, manager_ids: Iterable[int]):
+        for manager_id in manager_ids:
+            self._points[manager_id] = self.compute_points(self._teams[manager_id])
+
+    def standings(self) -> List[dict]:
+        """ Return the projected standings, ordered by projected total, highest first. """
+        rows = list()
+        for manager_id, team in self._teams.items():
+            points = self._points[manager_id]
+            rows.append({"manager_id": manager_id, "name": team.name, "live_points": points, "total": team.previous_total + points})
+        rows.sort(key=lambda row: (-row["total"], -row["live_points"], row["manager_id"]))
+        for rank, row in enumerate(rows, start=1):
+            row["rank"] = rank
+        return rows
+
+    def compute_points(self, team: ManagerTeam) -> int:
+        if team.active_chip == "bboost":
+            players = list(team.elements)
+        else:
+            players = self.substitute(team.elements[:11], team.elements[11:])
+        points = sum(self.element_points(element) for element in players)
+        captain = self.armband(team, players)
+        if captain is not None:
+            points += self.element_points(captain) * (team.captain_multiplier - 1)
+        return points - team.transfers_cost
+
+    def substitute(self, starters: list, bench: list) -> list:
+        """ Return the players that score for a starting XI after automatic substitutions. """
+        players = list(starters)
+        bench = list(bench)
+        for index, element in enumerate(starters):
+            if not self.did_not_play(element):
+                continue
+            for substitute in bench:
+                if self.minutes(substitute) == 0 or not self.valid_substitution(players, element, substitute):
+                    continue
+                players[index] = substitute
+                bench.remove(substitute)
+                break
+        return players
+
+    def valid_substitution(self, players: list, element: int, substitute: int) -> bool:
+        element_type = self.element_type(element)
+        substitute_type = self.element_type(substitute)
+        if GOALKEEPER in (element_type, substitute_type):
+            return element_type == substitute_type
+        if element_type == substitute_type:
+            return True
+        count = sum(1 for player in players if self.element_type(player) == element_type)
+        substitute_count = sum(1 for player in players if self.element_type(player) == substitute_type)
+        return count > MINIMUM_FORMATION.get(element_type, 0) and substitute_count < MAXIMUM_FORMATION.get(substitute_type, 11)
+
+    def armband(self, team: ManagerTeam, players: list) -> Union[None, int]:
+        """ Return the element that gets the captain multiplier: the captain, or the vice-captain if the captain did not play. """
+        if team.captain is not None and not self.did_not_play(team.captain):
+            return team.captain
+        if team.vice_captain is not None and team.vice_captain in players and not self.did_not_play(team.vice_captain):
+            return team.vice_captain
+        return
+
+    def did_not_play(self, element: int) -> bool:
+        if self.minutes(element) > 0 or self._pending_teams is None:
+            return False
+        return self.element_team(element) not in self._pending_teams
+
+    def element_points(self, element: int) -> int:
+        return self._stats.get(element, dict()).get("total_points", 0)
+
+    def minutes(self, element: int) -> int:
+        return self._stats.get(element, dict()).get("minutes", 0)
+
+    def element_type(self, element: int) -> Union[None, int]:
+        player = self._elements.get(element)
+        return player["element_type"] if player else None
+
+    def element_team(self, element: int) -> Union[None, int]:
+        player = self._elements.get(element)
+        return player["team"] if player else None
+
+
+def build_live_league_table(gameweek: int, managers: Union[None, dict] = None, elements: Union[None, Dict[int, dict]] = None) -> LiveLeagueTable:
+    """ Build a LiveLeagueTable from the stored picks of managers in gameweek. Managers without stored picks are left out.
+
+    :param gameweek: (int) | Gameweek of the table.
+    :param managers: (dict) or None | Manager nickname mapped to manager ID. Defaults to config["managers"].
+    :param elements: (dict) or None | See LiveLeagueTable.
+    """
+    if managers is None:
+        managers = dict(config["managers"].items())
+    teams = list()
+    for manager, manager_id in managers.items():
+        picks_index = indexes.get_picks_index(f"{config['settings']['current_season']}/data/managers/{manager}_{manager_id}.json")
+        if picks_index.signature() is None:
+            continue
+        picks = picks_index.get(gameweek)
+        if picks is None:
+            continue
+        teams.append(ManagerTeam.from_picks(manager_id, manager, picks))
+    return LiveLeagueTable(teams, elements)
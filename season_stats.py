@@ -0,0 +1,154 @@
+import configparser
+from typing import Union
+
+import numpy as np
+
+import columnar
+import indexes
+
+config = configparser.ConfigParser()
+config.read("conf/config.ini")
+
+player_stats = ["total_points", "minutes", "goals_scored", "assists", "clean_sheets", "goals_conceded", "own_goals",
+                "penalties_saved", "penalties_missed", "yellow_cards", "red_cards", "saves", "bonus", "bps", "influence",
+                "creativity", "threat", "ict_index", "value", "transfers_balance", "selected", "transfers_in",
+                "transfers_out"]
+
+
+class SeasonStatsMatrix:
+    def __init__(self, elements: np.ndarray, values: np.ndarray, played_values: np.ndarray, appearances: np.ndarray):
+        """ Stats of every Premier League player in every gameweek, as a players x gameweeks x stats array.
+
+        Gameweek g is stored at index g - 1 and stats are ordered as in player_stats. Rows of a double gameweek are summed.
+
+        :param elements: (np.ndarray) | Element ID of every player row.
+        :param values: (np.ndarray) | Sum of all history rows per player, gameweek and stat.
+        :param played_values: (np.ndarray) | Same as values, but only over rows in which the player played minutes.
+        :param appearances: (np.ndarray) | Number of rows with minutes per player and gameweek.
+        """
+        self._elements = elements
+        self._values = values
+        self._played_values = played_values
+        self._appearances = appearances
+        self._rows = {int(element): row for row, element in enumerate(elements)}
+
+    @classmethod
+    def from_rows(cls, rows) -> "SeasonStatsMatrix":
+        rows = list(rows)
+        elements = np.array(sorted({row["element"] for row in rows}), dtype=np.int64)
+        element_rows = {int(element): index for index, element in enumerate(elements)}
+        values = np.zeros((len(elements), 38, len(player_stats)))
+        played_values = np.zeros((len(elements), 38, len(player_stats)))
+        appearances = np.zeros((len(elements), 38), dtype=np.int64)
+        for row in rows:
+            player_row = element_rows[row["element"]]
+            gameweek = row["round"] - 1
+            stat_values = [float(row[stat]) for stat in player_stats]
+            values[player_row, gameweek] += stat_values
+            if row["minutes"] > 0:
+                played_values[player_row, gameweek] += stat_values
+                appearances[player_row, gameweek] += 1
+        return cls(elements, values, played_values, appearances)
+
+    @classmethod
+    def from_columns(cls, columns: columnar.ColumnarHistory) -> "SeasonStatsMatrix":
+        """ Build the matrix from a columnar store, reading only the columns of player_stats, "element" and "round". """
+        elements = np.asarray(columns.elements, dtype=np.int64)
+        player_rows = np.searchsorted(elements, columns.column("element"))
+        gameweeks = np.asarray(columns.column("round"), dtype=np.int64) - 1
+        stat_values = np.stack([np.asarray(columns.column(stat), dtype=np.float64) for stat in player_stats], axis=1)
+        played = np.asarray(columns.column("minutes")) > 0
+        values = np.zeros((len(elements), 38, len(player_stats)))
+        played_values = np.zeros((len(elements), 38, len(player_stats)))
+        appearances = np.zeros((len(elements), 38), dtype=np.int64)
+        np.add.at(values, (player_rows, gameweeks), stat_values)
+        np.add.at(played_values, (player_rows[played], gameweeks[played]), stat_values[played])
+        np.add.at(appearances, (player_rows[played], gameweeks[played]), 1)
+        return cls(elements, values, played_values, appearances)
+
+    @property
+    def elements(self) -> np.ndarray:
+        return self._elements
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._values
+
+    @property
+    def appearances(self) -> np.ndarray:
+        return self._appearances
+
+    def row(self, element: Union[int, str]) -> Union[None, int]:
+        """ Return the row of element in the matrix, or None if it has no stored history. """
+        return self._rows.get(int(element))
+
+    def stat(self, stat: str, lower_gameweek: int = 1, upper_gameweek: int = 38) -> np.ndarray:
+        """ Return the players x gameweeks array of one stat between two gameweeks, both included. """
+        return self._values[:, lower_gameweek - 1:upper_gameweek, self._stat_index(stat)]
+
+    def total(self, stat: str, lower_gameweek: int = 1, upper_gameweek: int = 38) -> np.ndarray:
+        return self.stat(stat, lower_gameweek, upper_gameweek).sum(axis=1)
+
+    def per_90(self, stat: str, lower_gameweek: int = 1, upper_gameweek: int = 38) -> np.ndarray:
+        """ Return stat per 90 minutes for every player. Players without minutes get NaN. """
+        minutes = self.total("minutes", lower_gameweek, upper_gameweek)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(minutes > 0, self.total(stat, lower_gameweek, upper_gameweek) / minutes * 90, np.nan)
+
+    def per_game(self, stat: str, lower_gameweek: int = 1, upper_gameweek: int = 38) -> np.ndarray:
+        """ Return stat per game in which the player played minutes, for every player. Players without games get NaN. """
+        games = self._appearances[:, lower_gameweek - 1:upper_gameweek].sum(axis=1)
+        total = self._played_values[:, lower_gameweek - 1:upper_gameweek, self._stat_index(stat)].sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(games > 0, total / games, np.nan)
+
+    def rolling(self, stat: str, window: int, per_90: bool = False) -> np.ndarray:
+        """ Return the rolling sum of stat over the last window gameweeks, as a players x gameweeks array.
+
+        :param per_90: (bool) | If set to True, the rolling sum is divided by the rolling minutes and multiplied by 90.
+        """
+        rolling_stat = self._rolling_sum(self.stat(stat), window)
+        if not per_90:
+            return rolling_stat
+        rolling_minutes = self._rolling_sum(self.stat("minutes"), window)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(rolling_minutes > 0, rolling_stat / rolling_minutes * 90, np.nan)
+
+    def leaderboard(self, values: np.ndarray, top: int = 10, min_minutes: int = 0) -> list:
+        """ Return the top (element, value) pairs of a per-player array, highest first. NaN values are left out.
+
+        :param values: (np.ndarray) | One value per player row, e.g. the result of per_90().
+        :param top: (int) | Number of players returned.
+        :param min_minutes: (int) | Leave out players with fewer season minutes.
+        """
+        mask = ~np.isnan(values) & (self.total("minutes") >= min_minutes)
+        candidates = np.flatnonzero(mask)
+        order = candidates[np.argsort(-values[candidates], kind="stable")][:top]
+        return [(int(self._elements[index]), float(values[index])) for index in order]
+
+    @staticmethod
+    def _rolling_sum(array: np.ndarray, window: int) -> np.ndarray:
+        if window < 1:
+            raise ValueError(f"Window {window} is not a positive number of gameweeks")
+        cumulative = np.cumsum(array, axis=1)
+        cumulative[:, window:] = cumulative[:, window:] - cumulative[:, :-window]
+        return cumulative
+
+    @staticmethod
+    def _stat_index(stat: str) -> int:
+        if stat not in player_stats:
+            raise ValueError(f"Stat {stat} not one of {player_stats}")
+        return player_stats.index(stat)
+
+
+class SeasonStatsStore(indexes.GameweekHistoryIndex):
+    """ Process-wide SeasonStatsMatrix of the stored gameweek history, rebuilt when a gameweek file changes. """
+
+    def build(self) -> SeasonStatsMatrix:
+        return SeasonStatsMatrix.from_rows(self.load_rows())
+
+    def build_from_columns(self, columns: columnar.ColumnarHistory) -> SeasonStatsMatrix:
+        return SeasonStatsMatrix.from_columns(columns)
+
+
+season_stats = SeasonStatsStore(f"{config['settings']['current_season']}/data/players/gameweek_history", indexes.history_columns)
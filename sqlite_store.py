@@ -0,0 +1,274 @@
+import configparser
+import glob
+import json
+import os
+import sqlite3
+import threading
+from typing import Iterable, Union
+
+import json_stream
+
+config = configparser.ConfigParser()
+config.read("conf/config.ini")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS elements (
+    id INTEGER PRIMARY KEY,
+    web_name TEXT NOT NULL COLLATE NOCASE,
+    team INTEGER,
+    element_type INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS elements_web_name ON elements (web_name);
+CREATE TABLE IF NOT EXISTS teams (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL COLLATE NOCASE,
+    short_name TEXT NOT NULL COLLATE NOCASE,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS teams_name ON teams (name);
+CREATE INDEX IF NOT EXISTS teams_short_name ON teams (short_name);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    finished INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fixtures (
+    id INTEGER PRIMARY KEY,
+    event INTEGER,
+    team_h INTEGER NOT NULL,
+    team_a INTEGER NOT NULL,
+    finished INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fixtures_teams ON fixtures (team_h, team_a);
+CREATE INDEX IF NOT EXISTS fixtures_event ON fixtures (event);
+CREATE TABLE IF NOT EXISTS element_history (
+    element INTEGER NOT NULL,
+    fixture INTEGER NOT NULL,
+    round INTEGER NOT NULL,
+    total_points INTEGER NOT NULL,
+    minutes INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (element, fixture)
+);
+CREATE INDEX IF NOT EXISTS element_history_round ON element_history (round, element);
+CREATE TABLE IF NOT EXISTS manager_gameweeks (
+    manager_id INTEGER NOT NULL,
+    event INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (manager_id, event)
+);
+CREATE TABLE IF NOT EXISTS manager_picks (
+    manager_id INTEGER NOT NULL,
+    event INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    element INTEGER NOT NULL,
+    multiplier INTEGER NOT NULL,
+    is_captain INTEGER NOT NULL,
+    is_vice_captain INTEGER NOT NULL,
+    PRIMARY KEY (manager_id, event, position)
+);
+CREATE INDEX IF NOT EXISTS manager_picks_captain ON manager_picks (is_captain, event);
+CREATE INDEX IF NOT EXISTS manager_picks_element ON manager_picks (element, event);
+"""
+
+
+class SeasonDatabase:
+    def __init__(self, path: str):
+        """ SQLite copy of the season data, with indexed tables for elements, element history, fixtures, teams, manager
+        picks and events.
+
+        It is filled by the save functions of data.py when the "sqlite" setting is enabled, next to the JSON files. The
+        full API payloads are kept in the data columns, so the returned dicts are the same as the stored JSON.
+
+        :param path: (str) | Path of the database file. It is created if it does not exist.
+        """
+        self._path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        # Every save is one transaction. With a write-ahead log, readers in other processes never see a partial one.
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def connection(self):
+        return self._connection
+
+    def close(self):
+        self._connection.close()
+
+    def _write(self, statement: str, rows: Iterable[tuple]):
+        with self._lock, self._connection:
+            self._connection.executemany(statement, rows)
+
+    def _query(self, statement: str, parameters: tuple = ()) -> list:
+        with self._lock:
+            return self._connection.execute(statement, parameters).fetchall()
+
+    def is_empty(self, table: str) -> bool:
+        return not self._query(f"SELECT 1 FROM {table} LIMIT 1")
+
+    def backfill(self, season_directory: str):
+        """ Fill the tables that are still empty from the JSON files stored in season_directory.
+
+        Data saved before the "sqlite" setting was enabled is only stored as JSON. Without a backfill it would not be
+        found in the database until it is fetched again.
+
+        :param season_directory: (str) | Directory of the season, e.g. "2021".
+        """
+        data_directory = os.path.join(season_directory, "data")
+        bootstrap_static_path = os.path.join(data_directory, "bootstrap_static.json")
+        if os.path.exists(bootstrap_static_path):
+            if self.is_empty("elements"):
+                self.save_elements(json_stream.iter_file_items(bootstrap_static_path, "elements"))
+            if self.is_empty("events"):
+                self.save_events(json_stream.iter_file_items(bootstrap_static_path, "events"))
+        teams_path = os.path.join(data_directory, "teams", "all_teams.json")
+        if os.path.exists(teams_path) and self.is_empty("teams"):
+            self.save_teams(list(json_stream.iter_file_items(teams_path)))
+        fixtures_path = os.path.join(data_directory, "fixtures", "all_fixtures.json")
+        if os.path.exists(fixtures_path) and self.is_empty("fixtures"):
+            self.save_fixtures(json_stream.iter_file_items(fixtures_path))
+        if self.is_empty("element_history"):
+            for path in glob.glob(os.path.join(data_directory, "players", "gameweek_history", "gameweek_*.json")):
+                self.save_element_history(list(json_stream.iter_file_items(path)))
+        if self.is_empty("manager_gameweeks"):
+            for path in glob.glob(os.path.join(data_directory, "managers", "*_*.json")):
+                with open(path, "r") as file:
+                    gw_history = json.load(file)
+                # Old files are stored as a dict of gameweek to picks.
+                if isinstance(gw_history, dict):
+                    gw_history = list(gw_history.values())
+                self.save_manager_picks(os.path.basename(path)[:-len(".json")].rsplit("_", 1)[1], gw_history)
+
+    def save_elements(self, elements: Iterable[dict]):
+        self._write("INSERT OR REPLACE INTO elements VALUES (?, ?, ?, ?, ?)",
+                    ((element["id"], element["web_name"], element["team"], element["element_type"], json.dumps(element)) for element in elements))
+
+    def save_teams(self, teams: list):
+        self._write("INSERT OR REPLACE INTO teams VALUES (?, ?, ?, ?)",
+                    ((team["id"], team["name"], team["short_name"], json.dumps(team)) for team in teams))
+
+    def save_events(self, events: Iterable[dict]):
+        self._write("INSERT OR REPLACE INTO events VALUES (?, ?, ?)",
+                    ((event["id"], int(bool(event["finished"])), json.dumps(event)) for event in events))
+
+    def save_fixtures(self, fixtures: Iterable[dict]):
+        self._write("INSERT OR REPLACE INTO fixtures VALUES (?, ?, ?, ?, ?, ?)",
+                    ((fixture["id"], fixture["event"], fixture["team_h"], fixture["team_a"], int(bool(fixture["finished"])), json.dumps(fixture))
+                     for fixture in fixtures))
+
+    def save_element_history(self, history: list):
+        """ Save element-summary history rows. A row of the same (element, fixture) is replaced. """
+        self._write("INSERT OR REPLACE INTO element_history VALUES (?, ?, ?, ?, ?, ?)",
+                    ((row["element"], row["fixture"], row["round"], row["total_points"], row["minutes"], json.dumps(row)) for row in history))
+
+    def save_manager_picks(self, manager_id: Union[int, str], gw_history: list):
+        """ Save the picks of a manager, one entry per gameweek as returned by the picks endpoint. """
+        gameweeks = list()
+        picks = list()
+        for event in gw_history:
+            if "entry_history" not in event:
+                continue
+            gameweek = event["entry_history"]["event"]
+            gameweeks.append((int(manager_id), gameweek, json.dumps(event)))
+            for pick in event["picks"]:
+                picks.append((int(manager_id), gameweek, pick["position"], pick["element"], pick["multiplier"],
+                              int(pick["is_captain"]), int(pick["is_vice_captain"])))
+        with self._lock, self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO manager_gameweeks VALUES (?, ?, ?)", gameweeks)
+            self._connection.executemany("INSERT OR REPLACE INTO manager_picks VALUES (?, ?, ?, ?, ?, ?, ?)", picks)
+
+    def get_element(self, element_id: Union[int, str]) -> Union[None, dict]:
+        rows = self._query("SELECT data FROM elements WHERE id = ?", (int(element_id),))
+        return json.loads(rows[0][0]) if rows else None
+
+    def get_element_by_web_name(self, web_name: str) -> Union[None, dict]:
+        rows = self._query("SELECT data FROM elements WHERE web_name = ? ORDER BY id LIMIT 1", (web_name,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def get_team(self, team_id: Union[int, str]) -> Union[None, dict]:
+        rows = self._query("SELECT data FROM teams WHERE id = ?", (int(team_id),))
+        return json.loads(rows[0][0]) if rows else None
+
+    def get_teams(self) -> list:
+        rows = self._query("SELECT data FROM teams ORDER BY id")
+        return [json.loads(row[0]) for row in rows]
+
+    def get_team_by_name(self, team_name: str) -> Union[None, dict]:
+        """ Return a team by its name or short name, case insensitive, or None if it is not found. """
+        rows = self._query("SELECT data FROM teams WHERE name = ? OR short_name = ? ORDER BY id LIMIT 1", (team_name, team_name))
+        return json.loads(rows[0][0]) if rows else None
+
+    def get_event(self, event_id: Union[int, str]) -> Union[None, dict]:
+        rows = self._query("SELECT data FROM events WHERE id = ?", (int(event_id),))
+        return json.loads(rows[0][0]) if rows else None
+
+    def get_fixture(self, fixture_id: Union[int, str]) -> Union[None, dict]:
+        rows = self._query("SELECT data FROM fixtures WHERE id = ?", (int(fixture_id),))
+        return json.loads(rows[0][0]) if rows else None
+
+    def get_fixture_by_teams(self, home_team_id: Union[int, str], away_team_id: Union[int, str]) -> Union[None, dict]:
+        rows = self._query("SELECT data FROM fixtures WHERE team_h = ? AND team_a = ? ORDER BY id LIMIT 1", (int(home_team_id), int(away_team_id)))
+        return json.loads(rows[0][0]) if rows else None
+
+    def get_fixtures_by_event(self, event: Union[None, int, str]) -> list:
+        if event is None:
+            rows = self._query("SELECT data FROM fixtures WHERE event IS NULL ORDER BY id")
+        else:
+            rows = self._query("SELECT data FROM fixtures WHERE event = ? ORDER BY id", (int(event),))
+        return [json.loads(row[0]) for row in rows]
+
+    def get_element_history(self, element: Union[int, str]) -> list:
+        rows = self._query("SELECT data FROM element_history WHERE element = ? ORDER BY round, fixture", (int(element),))
+        return [json.loads(row[0]) for row in rows]
+
+    def get_points(self, element: Union[int, str], gameweek: Union[int, str]) -> int:
+        """ Return the points of element in gameweek, 0 if it did not play. Rows of a double gameweek are summed. """
+        rows = self._query("SELECT TOTAL(total_points) FROM element_history WHERE round = ? AND element = ?", (int(gameweek), int(element)))
+        return int(rows[0][0])
+
+    def get_manager_gameweek(self, manager_id: Union[int, str], gameweek: Union[int, str]) -> Union[None, dict]:
+        """ Return the stored picks payload of a manager in a gameweek, or None if it is not stored. """
+        rows = self._query("SELECT data FROM manager_gameweeks WHERE manager_id = ? AND event = ?", (int(manager_id), int(gameweek)))
+        return json.loads(rows[0][0]) if rows else None
+
+    def get_captains(self, lower_gameweek: int, upper_gameweek: int, manager_ids: Union[None, list] = None) -> list:
+        """ Return the captain picks of all stored managers between two gameweeks, both included.
+
+        :param manager_ids: (list) or None | Only return the captains of these managers.
+        :return: (list) | (manager ID, gameweek, element, multiplier) tuples, ordered by manager ID and gameweek.
+        """
+        statement = "SELECT manager_id, event, element, multiplier FROM manager_picks WHERE is_captain = 1 AND event BETWEEN ? AND ?"
+        parameters = [int(lower_gameweek), int(upper_gameweek)]
+        if manager_ids is not None:
+            statement += f" AND manager_id IN ({', '.join('?' for _ in manager_ids)})"
+            parameters += [int(manager_id) for manager_id in manager_ids]
+        return self._query(statement + " ORDER BY manager_id, event", tuple(parameters))
+
+
+database = None
+
+
+def database_path() -> str:
+    return f"{config['settings']['current_season']}/data/season.sqlite"
+
+
+def get_database() -> Union[None, SeasonDatabase]:
+    """ Return the process-wide SeasonDatabase, or None if the "sqlite" setting in config.ini is not enabled.
+
+    Tables that are still empty when the database is opened are backfilled from the stored JSON files.
+    """
+    global database
+    if not config["settings"].getboolean("sqlite", fallback=False):
+        return
+    if database is None:
+        season_database = SeasonDatabase(database_path())
+        season_database.backfill(config["settings"]["current_season"])
+        database = season_database
+    return database
@@ -0,0 +1,225 @@
+import configparser
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterator, Union
+
+import fpl_api
+import storage
+
+config = configparser.ConfigParser()
+config.read("conf/config.ini")
+
+
+class StandingsStore:
+    def __init__(self, directory: str):
+        """ Standings of one league stored on disk, one file per page of the standings endpoint.
+
+        meta.json holds the league properties, the last_updated_data of the crawl, the stored pages and whether the crawl
+        reached the last page. Entries are read back page by page, so the standings are never all in memory at once.
+
+        :param directory: (str) | Directory of the store. It is created if it does not exist.
+        """
+        self._directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._meta = self.load_meta()
+
+    @property
+    def directory(self):
+        return self._directory
+
+    @property
+    def meta(self) -> dict:
+        return self._meta
+
+    @property
+    def meta_path(self):
+        return os.path.join(self.directory, "meta.json")
+
+    @property
+    def complete(self) -> bool:
+        return self._meta["last_page"] is not None and all(str(page) in self._meta["pages"] for page in range(1, self._meta["last_page"] + 1))
+
+    def load_meta(self) -> dict:
+        try:
+            with open(self.meta_path, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {"league": None, "last_updated_data": None, "pages": dict(), "last_page": None}
+
+    def save_meta(self):
+        storage.write_json(self.meta_path, self._meta)
+
+    def page_path(self, page: int) -> str:
+        return os.path.join(self.directory, f"page_{page}.json")
+
+    def has_page(self, page: int) -> bool:
+        return str(page) in self._meta["pages"] and os.path.exists(self.page_path(page))
+
+    def reset(self, league: dict, last_updated_data: Union[None, str]):
+        """ Start a new crawl of data last updated at last_updated_data. Pages of an older crawl are dropped. """
+        for page in self._meta["pages"]:
+            if os.path.exists(self.page_path(int(page))):
+                os.remove(self.page_path(int(page)))
+        self._meta = {"league": league, "last_updated_data": last_updated_data, "pages": dict(), "last_page": None}
+        self.save_meta()
+
+    def save_page(self, page: int, standings: dict):
+        """ Store the standings part of one page and record it in meta.json. """
+        storage.write_json(self.page_path(page), standings["results"])
+        self._meta["pages"][str(page)] = len(standings["results"])
+        if not standings["has_next"]:
+            self._meta["last_page"] = page
+        self.save_meta()
+
+    def iter_entries(self) -> Iterator[dict]:
+        """ Yield the stored entries in page order. """
+        for page in sorted(int(page) for page in self._meta["pages"]):
+            if self._meta["last_page"] is not None and page > self._meta["last_page"]:
+                break
+            with open(self.page_path(page), "r") as file:
+                yield from json.load(file)
+
+    def entry_ids(self) -> list:
+        return [entry["entry"] for entry in self.iter_entries()]
+
+
+class StandingsCrawler:
+    def __init__(self, league_id: Union[int, str], league_type: str = "CLASSIC", phase: Union[None, int] = None,
+                 conn: Union[None, fpl_api.FPLCalls] = None, store: Union[None, StandingsStore] = None, max_workers: int = 8,
+                 calls_per_second: float = 25.0):
+        """ Crawls all pages of the standings of a league into a StandingsStore.
+
+        Page 1 is fetched first. The following pages are fetched concurrently, with at most max_workers calls in flight,
+        until a page has no next page. Pages are written to the store as they arrive.
+
+        A crawl continues where an earlier one stopped: if the league was not updated since (same last_updated_data on
+        page 1), stored pages are not fetched again, so a complete store costs one call. If the league was updated,
+        all pages are fetched again. Every page is checked against the last_updated_data of page 1, so a league that is
+        updated during a crawl is crawled again from the start instead of mixing pages of both versions.
+
+        :param league_id: (int) or (str) | ID of the league.
+        :param league_type: (str) | "CLASSIC" or "H2H".
+        :param phase: (int) or None | Phase of the season as described in bootstrap-static. None for the overall standings.
+        :param conn: (fpl_api.FPLCalls) or None | Connection used for the calls. Size its pool to max_workers and give it
+                                                  an fpl_api.RateLimiter.
+        :param store: (StandingsStore) or None | Defaults to the store of the league in the current season.
+        :param max_workers: (int) | Maximum number of pages in flight at the same time.
+        :param calls_per_second: (float) | Rate limit shared by all workers if conn is None.
+        """
+        league_types = ["CLASSIC", "H2H"]
+        if league_type not in league_types:
+            raise ValueError("Invalid league type. Expected one of: %s" % league_types)
+        self._league_id = league_id
+        self._league_type = league_type
+        self._phase = phase
+        if conn is None:
+            conn = fpl_api.FPLCalls(pool_maxsize=max_workers, pool_block=True, rate_limiter=fpl_api.RateLimiter(rate=calls_per_second, burst=max_workers))
+        self._conn = conn
+        self._store = store if store is not None else StandingsStore(standings_directory(league_id, phase))
+        self._max_workers = max_workers
+
+    @property
+    def league_id(self):
+        return self._league_id
+
+    @property
+    def league_type(self):
+        return self._league_type
+
+    @property
+    def phase(self):
+        return self._phase
+
+    @property
+    def conn(self):
+        return self._conn
+
+    @property
+    def store(self):
+        return self._store
+
+    @property
+    def max_workers(self):
+        return self._max_workers
+
+    def get_page(self, page: int):
+        if self.league_type == "CLASSIC":
+            return self.conn.get_classic_league_standings(self.league_id, page_new_entries=None, page_standings=page, phase=self.phase)
+        return self.conn.get_h2h_league_standings(self.league_id, page_new_entries=None, page_standings=page, phase=self.phase)
+
+    def crawl(self, max_restarts: int = 3) -> StandingsStore:
+        """ Crawl the standings into the store and return it.
+
+        :param max_restarts: (int) | Number of times the crawl starts again if the league is updated during the crawl.
+        :raise ConnectionError: If page 1 or another page could not be fetched, or if the league kept being updated
+                                during the crawl. Crawl again to resume.
+        """
+        for _ in range(max_restarts + 1):
+            first_page_call = self.get_page(1)
+            if first_page_call.status_code != 200:
+                raise ConnectionError(f"Standings of league {self.league_id} returned {first_page_call.status_code}")
+            first_page = json.loads(first_page_call.text)
+            last_updated_data = first_page.get("last_updated_data")
+            if last_updated_data is None or last_updated_data != self.store.meta["last_updated_data"]:
+                self.store.reset(first_page["league"], last_updated_data)
+            with storage.fsync_batch():
+                self.store.save_page(1, first_page["standings"])
+                if not first_page["standings"]["has_next"] or self.crawl_pages(2):
+                    return self.store
+        raise ConnectionError(f"Standings of league {self.league_id} were updated during every crawl. Crawl again to resume.")
+
+    def crawl_pages(self, first_page: int) -> bool:
+        """ Fetch the pages from first_page on that are not stored yet, until the last page is stored.
+
+        :return: (bool) | False if the league was updated during the crawl. Pages of the new version are not stored.
+        """
+        next_page = first_page
+        # First page known to be past the end. Pages after it are not requested.
+        end_page = None
+        failed_pages = list()
+        updated = False
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            in_flight = dict()
+            while True:
+                while not updated and len(in_flight) < self.max_workers and not self.past_end(next_page, end_page):
+                    if not self.store.has_page(next_page):
+                        in_flight[executor.submit(self.get_page, next_page)] = next_page
+                    next_page += 1
+                if not in_flight:
+                    break
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    page = in_flight.pop(future)
+                    try:
+                        response = future.result()
+                        if response.status_code != 200:
+                            failed_pages.append(page)
+                            continue
+                        payload = json.loads(response.text)
+                    except Exception as error:
+                        print(f"Standings page {page} of league {self.league_id} raised {error!r}")
+                        failed_pages.append(page)
+                        continue
+                    if payload.get("last_updated_data") != self.store.meta["last_updated_data"]:
+                        updated = True
+                        continue
+                    standings = payload["standings"]
+                    if not standings["results"]:
+                        end_page = page if end_page is None else min(end_page, page)
+                        continue
+                    self.store.save_page(page, standings)
+        if updated:
+            return False
+        if failed_pages:
+            raise ConnectionError(f"Standings pages {sorted(failed_pages)} of league {self.league_id} could not be fetched. Crawl again to resume.")
+        return True
+
+    def past_end(self, page: int, end_page: Union[None, int]) -> bool:
+        last_page = self.store.meta["last_page"]
+        return (last_page is not None and page > last_page) or (end_page is not None and page >= end_page)
+
+
+def standings_directory(league_id: Union[int, str], phase: Union[None, int] = None) -> str:
+    directory = f"{config['settings']['current_season']}/data/leagues/{league_id}/standings"
+    return directory if not phase else f"{directory}_phase_{phase}"
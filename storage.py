@@ -0,0 +1,119 @@
+import contextlib
+import json
+import os
+import tempfile
+import threading
+from typing import Iterable
+
+# Paths written while an fsync batch is open. None if no batch is open.
+pending_paths = None
+pending_lock = threading.Lock()
+# Process umask. It can only be read by setting it, so it is read once at import.
+umask = os.umask(0)
+os.umask(umask)
+
+
+def write_bytes(path: str, content: bytes, durable: bool = True):
+    """ Write content to path atomically.
+
+    content is written to a temporary file next to path, which then replaces path with os.replace. Readers, also in
+    other threads or processes, see either the old file or the complete new file, never a truncated one.
+
+    :param path: (str) | Path of the file.
+    :param content: (bytes) | Content of the file.
+    :param durable: (bool) | If set to True, the file is flushed to disk before it replaces path. Inside fsync_batch()
+                             this is postponed to the end of the batch, so many files are flushed together.
+    """
+    write_chunks(path, (content,), durable)
+
+
+def write_chunks(path: str, chunks: Iterable[bytes], durable: bool = True) -> int:
+    """ Write an iterable of chunks to path atomically, without holding the whole content in memory. See write_bytes.
+
+    :param chunks: (iterable) | Chunks of bytes, e.g. requests.Response.iter_content().
+    :return: (int) | Number of bytes written.
+    """
+    directory = os.path.dirname(path) or "."
+    file_descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    size = 0
+    try:
+        with os.fdopen(file_descriptor, "wb") as file:
+            for chunk in chunks:
+                file.write(chunk)
+                size += len(chunk)
+            if durable and pending_paths is None:
+                file.flush()
+                os.fsync(file.fileno())
+        # mkstemp creates the file with mode 0600, which os.replace would keep.
+        os.chmod(temp_path, file_mode(path))
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    if not durable:
+        return size
+    with pending_lock:
+        if pending_paths is not None:
+            pending_paths.add(path)
+            return size
+    fsync_directory(directory)
+    return size
+
+
+def file_mode(path: str) -> int:
+    """ Return the permission bits of path, or those of a new file created with open() if path does not exist. """
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except OSError:
+        return 0o666 & ~umask
+
+
+def write_text(path: str, text: str, durable: bool = True):
+    write_bytes(path, text.encode(), durable)
+
+
+def write_json(path: str, payload, durable: bool = True):
+    write_bytes(path, json.dumps(payload).encode(), durable)
+
+
+def fsync_path(path: str):
+    file_descriptor = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(file_descriptor)
+    finally:
+        os.close(file_descriptor)
+
+
+def fsync_directory(directory: str):
+    """ Flush a directory entry to disk, so a rename in it survives a crash. Not supported on every platform. """
+    try:
+        fsync_path(directory)
+    except OSError:
+        pass
+
+
+@contextlib.contextmanager
+def fsync_batch():
+    """ Postpone the fsync of every durable write until the end of the with block.
+
+    Writes inside the block are still atomic, so readers never see a half-written file, but they are flushed to disk
+    together at the end: every file once, then every directory once. Blocks can be nested; only the outer one flushes.
+    """
+    global pending_paths
+    with pending_lock:
+        outer = pending_paths is None
+        if outer:
+            pending_paths = set()
+    try:
+        yield
+    finally:
+        if outer:
+            with pending_lock:
+                paths = pending_paths
+                pending_paths = None
+            for path in paths:
+                if os.path.exists(path):
+                    fsync_path(path)
+            for directory in {os.path.dirname(path) or "." for path in paths}:
+                fsync_directory(directory)
@@ -0,0 +1,300 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Union
+
+import requests
+
+import columnar
+import storage
+
+
+class SeasonSnapshot:
+    def __init__(self, bootstrap_static: Union[None, dict], event_status: dict, conn=None):
+        """ Run-scoped snapshot of the bootstrap-static and event-status payloads.
+
+        It is fetched once at the start of a sync run and handed to every stage, so no stage downloads
+        bootstrap-static again.
+
+        :param bootstrap_static: (dict) or None | Decoded bootstrap-static payload. If None, it is fetched with conn
+                                                  the first time it is used.
+        :param event_status: (dict) | Decoded event-status payload.
+        :param conn: (fpl_api.FPLCalls) or None | Connection used to fetch bootstrap-static later.
+        """
+        self._bootstrap_static = bootstrap_static
+        self._event_status = event_status
+        self._conn = conn
+
+    @classmethod
+    def fetch(cls, conn, engine: Union[None, "SyncEngine"] = None) -> Union[None, "SeasonSnapshot"]:
+        """ Fetch a new snapshot.
+
+        :param conn: (fpl_api.FPLCalls) | Connection used for the calls.
+        :param engine: (SyncEngine) or None | If given, the calls are counted in its "snapshot" stage summary.
+        :return: (SeasonSnapshot) or None | None if one of the calls did not return a 200 status code.
+        """
+        if engine:
+            bootstrap_static_call = engine.call("snapshot", conn.get_bootstrap_static)
+            event_status_call = engine.call("snapshot", conn.get_event_status)
+        else:
+            bootstrap_static_call = conn.get_bootstrap_static()
+            event_status_call = conn.get_event_status()
+        if bootstrap_static_call.status_code != 200 or event_status_call.status_code != 200:
+            return
+        return cls(json.loads(bootstrap_static_call.content), json.loads(event_status_call.content))
+
+    @classmethod
+    def fetch_event_status(cls, conn) -> Union[None, "SeasonSnapshot"]:
+        """ Fetch a snapshot of which only event-status is fetched right away. bootstrap-static is fetched when first used.
+
+        :param conn: (fpl_api.FPLCalls) | Connection used for the calls.
+        :return: (SeasonSnapshot) or None | None if the event-status call did not return a 200 status code.
+        """
+        event_status_call = conn.get_event_status()
+        if event_status_call.status_code != 200:
+            return
+        return cls(None, json.loads(event_status_call.content), conn)
+
+    @property
+    def bootstrap_static(self) -> dict:
+        if self._bootstrap_static is None:
+            bootstrap_static_call = self._conn.get_bootstrap_static()
+            if bootstrap_static_call.status_code != 200:
+                raise ConnectionError(f"Bootstrap-static call returned {bootstrap_static_call.status_code}")
+            self._bootstrap_static = json.loads(bootstrap_static_call.content)
+        return self._bootstrap_static
+
+    @property
+    def event_status(self) -> dict:
+        return self._event_status
+
+    @property
+    def elements(self) -> list:
+        return self.bootstrap_static["elements"]
+
+    @property
+    def teams(self) -> list:
+        return self.bootstrap_static["teams"]
+
+    @property
+    def events(self) -> list:
+        return self.bootstrap_static["events"]
+
+    @property
+    def previous_gameweek(self) -> int:
+        """ Last gameweek of which the league tables are updated. """
+        if self._event_status["leagues"] == "Updated":
+            return self._event_status["status"][0]["event"]
+        return self._event_status["status"][0]["event"] - 1
+
+    @property
+    def finished_gameweeks(self) -> list:
+        return [gameweek for gameweek in self.events if gameweek["finished"] and gameweek["data_checked"]]
+
+    @property
+    def last_finished_gameweek(self) -> int:
+        return max([gameweek["id"] for gameweek in self.finished_gameweeks], default=0)
+
+
+class GameweekHistoryAccumulator:
+    def __init__(self, directory: str, columns_directory: Union[None, str] = None):
+        """ Collects the gameweek history rows of a sync run in memory, per gameweek.
+
+        flush() writes every gameweek_N.json file once, instead of rewriting it for every row. Rows are deduplicated by
+        (element, fixture), so rerunning a sync replaces rows instead of appending them again.
+
+        :param directory: (str) | Directory holding the gameweek_N.json files.
+        :param columns_directory: (str) or None | If given, flush() also rewrites the columnar store of all stored rows
+                                                  in this directory, see columnar.write_history_columns.
+        """
+        self._directory = directory
+        self._columns_directory = columns_directory
+        self._gameweeks = dict()
+
+    @property
+    def directory(self):
+        return self._directory
+
+    @property
+    def columns_directory(self):
+        return self._columns_directory
+
+    def add(self, history: list):
+        """ Add the history rows of one element-summary payload. """
+        for row in history:
+            self._gameweeks.setdefault(row["round"], dict())[(row["element"], row["fixture"])] = row
+
+    def flush(self):
+        """ Merge the collected rows into the stored gameweek files and write each touched file once. """
+        stored = dict()
+        for gameweek in range(1, 39):
+            path = os.path.join(self.directory, f"gameweek_{gameweek}.json")
+            if gameweek not in self._gameweeks and (self.columns_directory is None or not os.path.exists(path)):
+                continue
+            merged = dict()
+            if os.path.exists(path):
+                with open(path, "r") as file:
+                    for row in json.load(file):
+                        merged[(row["element"], row["fixture"])] = row
+            if gameweek in self._gameweeks:
+                merged.update(self._gameweeks[gameweek])
+                storage.write_json(path, [merged[key] for key in sorted(merged)])
+            stored[gameweek] = merged
+        if self.columns_directory is not None and (self._gameweeks or not os.path.exists(self.columns_directory)):
+            columnar.write_history_columns((row for rows in stored.values() for row in rows.values()), self.columns_directory)
+        self._gameweeks = dict()
+
+
+class SyncRequest:
+    def __init__(self, stage: str, call: Callable[..., requests.Response], args: tuple, handler: Callable[[requests.Response], None],
+                 error_handler: Union[None, Callable[[requests.Response], None]] = None):
+        """ One planned API call of a sync run.
+
+        :param stage: (str) | Name of the sync stage the call belongs to.
+        :param call: (callable) | FPLCalls method doing the call.
+        :param args: (tuple) | Positional arguments for call.
+        :param handler: (callable) | Called with the requests.Response of a successful (200) call.
+        :param error_handler: (callable) or None | Called with the requests.Response of a call that did not return 200.
+        """
+        self.stage = stage
+        self.call = call
+        self.args = args
+        self.handler = handler
+        self.error_handler = error_handler
+
+
+class StageSummary:
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.requests = 0
+        self.failed = 0
+        self.cached = 0
+        self.bytes = 0
+        self.request_seconds = 0.0
+        self.first_start = None
+        self.last_end = None
+
+    def __str__(self):
+        return f"{self.stage:<20} {self.requests:>6} requests {self.failed:>4} failed {self.cached:>6} cached {self.bytes / 1e6:>9.2f} MB {self.seconds:>8.2f} s"
+
+    @property
+    def seconds(self) -> float:
+        """ Wall-clock time between the start of the first and the end of the last call of this stage. """
+        if self.first_start is None:
+            return 0.0
+        return self.last_end - self.first_start
+
+    def add_error(self):
+        """ Count a call that raised instead of returning a response. """
+        self.requests += 1
+        self.failed += 1
+
+    def add(self, response: requests.Response, start: float, end: float):
+        self.requests += 1
+        if response.status_code != 200:
+            self.failed += 1
+        if getattr(response, "from_cache", False):
+            self.cached += 1
+        elif getattr(response, "streamed", False):
+            # Reading content would load a streamed body into memory.
+            self.bytes += int(response.headers.get("Content-Length", 0))
+        else:
+            self.bytes += len(response.content or b"")
+        self.request_seconds += end - start
+        if self.first_start is None or start < self.first_start:
+            self.first_start = start
+        if self.last_end is None or end > self.last_end:
+            self.last_end = end
+
+
+class SyncEngine:
+    def __init__(self, max_workers: int = 8):
+        """ Runs planned API calls on a pool of worker threads.
+
+        All calls are planned up front with add(), then run() executes them with at most max_workers calls in flight.
+        Handlers are called on the calling thread as soon as their call completes, so results are written as they
+        arrive and handlers never run concurrently with each other.
+
+        :param max_workers: (int) | Maximum number of API calls in flight at the same time.
+        """
+        self._max_workers = max_workers
+        self._planned = list()
+        self._summaries = dict()
+
+    @property
+    def max_workers(self):
+        return self._max_workers
+
+    @property
+    def planned(self) -> List[SyncRequest]:
+        return self._planned
+
+    @property
+    def summaries(self) -> Dict[str, StageSummary]:
+        return self._summaries
+
+    def add(self, stage: str, call: Callable[..., requests.Response], args: tuple, handler: Callable[[requests.Response], None],
+            error_handler: Union[None, Callable[[requests.Response], None]] = None):
+        self._planned.append(SyncRequest(stage, call, args, handler, error_handler))
+        if stage not in self._summaries:
+            self._summaries[stage] = StageSummary(stage)
+
+    def call(self, stage: str, call: Callable[..., requests.Response], *args) -> requests.Response:
+        """ Do one call right away on the calling thread and count it in the summary of stage. """
+        if stage not in self._summaries:
+            self._summaries[stage] = StageSummary(stage)
+        response, start, end = self._timed_call(SyncRequest(stage, call, args, None))
+        self._summaries[stage].add(response, start, end)
+        return response
+
+    def run(self):
+        """ Execute all planned calls and hand every successful response to its handler.
+
+        A call or handler that raises is counted as failed in the summary of its stage, and the run goes on with the
+        other calls.
+        """
+        planned, self._planned = self._planned, list()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._timed_call, request): request for request in planned}
+            for future in as_completed(futures):
+                request = futures[future]
+                summary = self._summaries[request.stage]
+                try:
+                    response, start, end = future.result()
+                except Exception as error:
+                    summary.add_error()
+                    print(f"Stage {request.stage}: call {request.call.__name__}{request.args} raised {error!r}")
+                    continue
+                # A streamed response holds a pooled connection or a cache file until it is closed.
+                with response:
+                    summary.add(response, start, end)
+                    if response.status_code != 200:
+                        print(f"Stage {request.stage}: call {request.call.__name__}{request.args} returned {response.status_code}")
+                    handler = request.handler if response.status_code == 200 else request.error_handler
+                    if handler is None:
+                        continue
+                    try:
+                        handler(response)
+                    except Exception as error:
+                        summary.failed += 1
+                        print(f"Stage {request.stage}: handler of call {request.call.__name__}{request.args} raised {error!r}")
+
+    def print_summary(self):
+        total = StageSummary("total")
+        for summary in self.summaries.values():
+            print(summary)
+            total.requests += summary.requests
+            total.failed += summary.failed
+            total.cached += summary.cached
+            total.bytes += summary.bytes
+            if summary.first_start is not None:
+                total.first_start = summary.first_start if total.first_start is None else min(total.first_start, summary.first_start)
+                total.last_end = summary.last_end if total.last_end is None else max(total.last_end, summary.last_end)
+        print(total)
+
+    @staticmethod
+    def _timed_call(request: SyncRequest):
+        start = time.perf_counter()
+        response = request.call(*request.args)
+        return response, start, time.perf_counter()